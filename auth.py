@@ -0,0 +1,112 @@
+import time
+import weakref
+import threading
+
+
+class TokenSession(object):
+    """Holds the oauth token of a yql connection in memory.  The token is read
+    and checked once, then refreshed on a background timer margin seconds
+    before it expires so queries never wait on a token round trip
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The oauth connection the token secures
+    margin: float
+        The number of seconds before expiry to refresh the token.  Defaults to
+        300
+    retry: float
+        The number of seconds to wait before retrying a failed refresh.
+        Defaults to 60
+    """
+    _sessions = weakref.WeakKeyDictionary()
+    _sessions_lock = threading.Lock()
+
+    def __init__(self, y3, margin=300., retry=60.):
+        self.y3 = y3
+        self.margin = margin
+        self.retry = retry
+        self.token = None
+        self.timer = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, y3):
+        """Return the TokenSession shared by every user of y3"""
+        with cls._sessions_lock:
+            session = cls._sessions.get(y3)
+            if session is None:
+                session = cls._sessions[y3] = cls(y3)
+            return session
+
+    def expires_at(self):
+        """Return the time the token expires or None if it is unknown"""
+        try:
+            return int(self.token.timestamp) + int(self.token.expires_in)
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def get(self, dialog=None):
+        """Return the current token, reading it from the token store or asking
+        the user with dialog on the first call
+
+        Parameters
+        ----------
+        dialog: function
+            Called with the auth url if there is no stored token, returning the
+            verifier.  Defaults to None, asking on the command line
+
+        Returns
+        -------
+        yql.YahooToken
+        """
+        with self._lock:
+            expires_at = self.expires_at()
+            if self.token is None:
+                from yahoo_tools import get_token
+                self.token = get_token(self.y3, dialog)
+                self._schedule()
+            elif expires_at is not None and expires_at <= time.time():
+                # The background refresh has fallen behind
+                self._refresh()
+            return self.token
+
+    def refresh(self):
+        """Refresh the token now, storing the new token"""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        from yahoo_tools import get_token_store
+
+        try:
+            self.token = self.y3.refresh_token(self.token)
+            get_token_store().set('foo', self.token)
+        finally:
+            self._schedule()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            # _refresh has already scheduled the retry
+            pass
+
+    def _schedule(self, delay=None):
+        if self.timer is not None:
+            self.timer.cancel()
+        if delay is None:
+            expires_at = self.expires_at()
+            if expires_at is None:
+                return
+            delay = max(expires_at - self.margin - time.time(), self.retry)
+        self.timer = threading.Timer(delay, self._background_refresh)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def close(self):
+        """Stop refreshing the token in the background"""
+        with self._lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+
+from auth import TokenSession
+from cache import QueryCache
+from data import config
+
+
+class QueryError(Exception):
+    """A query failed.  resp is the http response it failed with, if any, so
+    its status can be checked without depending on yql
+    """
+    def __init__(self, message, resp=None):
+        Exception.__init__(self, message)
+        self.resp = resp
+
+class Result(object):
+    """The rows of a query, mirroring the rows attribute of yql.YQLObj"""
+    def __init__(self, rows):
+        self.rows = rows
+
+class Page(object):
+    """The content of a page, mirroring the parts of requests.Response used by
+    projected_stats
+    """
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+class Backend(object):
+    """Interface for the source of league data.  A backend can be passed
+    anywhere a yql.ThreeLegged connection is expected and also supplies the
+    token and the session used to scrape team pages
+    """
+    def execute(self, query, token=None, **kwargs):
+        """Run the yql query and return an object with the result rows,
+        raising QueryError if it fails
+        """
+        raise NotImplementedError
+
+    def get_token(self, dialog=None):
+        """Return the token to pass to execute"""
+        raise NotImplementedError
+
+    def get_session(self, url, pool_size=12, refresh=False):
+        """Return an object with a requests.Session style get(url, headers)
+        method for fetching team pages, logging in at url if needed or if
+        refresh is True because the last session had to log in again
+        """
+        raise NotImplementedError
+
+class YQLBackend(Backend):
+    """Backend querying Yahoo through yql with oauth.  The token is held by the
+    auth.TokenSession shared by every backend using y3, and queries always use
+    its current token so a token passed around before a refresh stays valid
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The oauth connection.  If None then yahoo_tools.get_y3() is called.
+        Defaults to None
+    """
+    def __init__(self, y3=None):
+        if y3 is None:
+            from yahoo_tools import get_y3
+            y3 = get_y3()
+        self.y3 = y3
+        self.session = TokenSession.of(y3)
+
+    def execute(self, query, token=None, **kwargs):
+        import yql
+
+        token = self.session.token or token
+        try:
+            return self.y3.execute(query, token=token, **kwargs)
+        except yql.YQLError as e:
+            raise QueryError(str(e), getattr(e, 'resp', None))
+
+    def get_token(self, dialog=None):
+        return self.session.get(dialog)
+
+    def get_session(self, url, pool_size=12, refresh=False):
+        from projected_stats import get_session
+        return get_session(url, pool_size, refresh)
+
+def fixture_path(directory, kind, key):
+    return os.path.join(directory, kind, QueryCache.key(key) + '.json')
+
+class RecordingBackend(Backend):
+    """Backend passing every request through to backend and saving each
+    response in directory for ReplayBackend
+
+    Parameters
+    ----------
+    backend: Backend
+        The backend to record
+    directory: str
+        The directory the fixtures are written to
+    """
+    def __init__(self, backend, directory):
+        self.backend = backend
+        self.directory = directory
+        config.mkdir_p(os.path.join(directory, 'yql'))
+        config.mkdir_p(os.path.join(directory, 'html'))
+
+    def record(self, kind, key, value):
+        with open(fixture_path(self.directory, kind, key), 'w') as f:
+            json.dump({'key': key, 'value': value}, f)
+
+    def execute(self, query, token=None, **kwargs):
+        result = self.backend.execute(query, token=token, **kwargs)
+        self.record('yql', query, result.rows)
+        return result
+
+    def get_token(self, dialog=None):
+        return self.backend.get_token(dialog)
+
+    def get_session(self, url, pool_size=12, refresh=False):
+        session = self.backend.get_session(url, pool_size, refresh)
+        backend = self
+
+        class RecordingSession(object):
+            def get(self, url, headers=None):
+                response = session.get(url)
+                response.raise_for_status()
+                backend.record('html', url, response.content)
+                return response
+        return RecordingSession()
+
+class ReplayBackend(Backend):
+    """Backend serving the fixtures saved by RecordingBackend without any
+    network access or oauth.  A query with no fixture raises QueryError, so
+    batched queries fall back to per-team queries as they would against Yahoo
+
+    Parameters
+    ----------
+    directory: str
+        The directory the fixtures were recorded to
+    latency: float
+        Seconds to sleep before every response to simulate a round trip.
+        Defaults to 0
+    """
+    def __init__(self, directory, latency=0.):
+        self.directory = directory
+        self.latency = latency
+        self.requests = 0
+
+    def replay(self, kind, key):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            with open(fixture_path(self.directory, kind, key)) as f:
+                return json.load(f)['value']
+        except IOError:
+            raise QueryError('No %s fixture for %s' % (kind, key))
+
+    def execute(self, query, token=None, **kwargs):
+        return Result(self.replay('yql', query))
+
+    def get_token(self, dialog=None):
+        return None
+
+    def get_session(self, url, pool_size=12, refresh=False):
+        return self
+
+    def get(self, url, headers=None):
+        return Page(self.replay('html', url))
@@ -0,0 +1,232 @@
+"""Time the data pipeline against recorded fixtures at several league sizes.
+
+Fixtures are generated by recording a synthetic league through
+RecordingBackend and then served by ReplayBackend with simulated latency::
+
+    python benchmarks.py --sizes 8 12 16 32 --latency 0.2
+
+The import time of the lightweight entry points is checked with::
+
+    python benchmarks.py --imports
+"""
+import re
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from backends import Backend, Result, Page, RecordingBackend, ReplayBackend
+from cache import set_cache_directory
+from ratelimit import set_limiter
+import instrument
+from projected_stats import get_all_points
+from yahoo_tools import load_teams, get_all_player_points
+
+
+LEAGUE_KEY = '348.l.1000'
+POSITIONS = ['QB', 'WR', 'WR', 'RB', 'RB', 'TE', 'W/R/T', 'K', 'DEF']
+POSITIONS += ['BN'] * 6
+STAT_IDS = [str(i) for i in range(4, 80)]
+# Modules that must only be imported when first used and those that must never
+# be imported by the headless entry points
+LAZY_MODULES = ['yql', 'dateutil', 'projected_stats', 'mechanize', 'cookielib',
+                'BeautifulSoup', 'lxml', 'requests', 'pandas', 'PySide']
+LIGHT_MODULES = ['data.config', 'player', 'yahoo_tools', 'scoreboard',
+                 'yff_daemon']
+
+
+class SyntheticBackend(Backend):
+    """Backend answering queries and page requests for a generated league of
+    num_teams teams so that fixtures of any size can be recorded
+    """
+    def __init__(self, num_teams):
+        self.num_teams = num_teams
+
+    def player(self, team, slot):
+        player_id = str(team * 100 + slot)
+        stats = [{'stat_id': s, 'value': str((team + slot + int(s)) % 7)}
+                 for s in STAT_IDS]
+        return {'player_id': player_id,
+                'name': {'first': 'First%s' % player_id,
+                         'last': 'Last%s' % player_id,
+                         'full': 'First%s Last%s' % (player_id, player_id)},
+                'display_position': POSITIONS[slot].replace('W/R/T', 'WR'),
+                'selected_position': {'position': POSITIONS[slot]},
+                'bye_weeks': {'week': str(4 + slot % 8)},
+                'player_points': {'total': str(float(team + slot))},
+                'player_stats': {'stats': {'stat': stats}}}
+
+    def scoreboard_team(self, team):
+        points = sum(team + slot for slot in range(len(POSITIONS)))
+        return {'team_key': '%s.t.%s' % (LEAGUE_KEY, team),
+                'name': 'Team %s' % team,
+                'team_points': {'total': str(float(points))},
+                'team_projected_points': {'total': str(float(points))},
+                'team_remaining_games': {'total': {
+                    'remaining_games': str(team % 3), 'live_games': '0',
+                    'completed_games': str(len(POSITIONS) - team % 3)}}}
+
+    def execute(self, query, token=None, **kwargs):
+        if 'fantasysports.leagues.settings' in query:
+            positions = [{'position': p, 'count': str(POSITIONS.count(p))}
+                         for p in sorted(set(POSITIONS), key=POSITIONS.index)]
+            categories = [{'stat_id': s, 'name': 'Stat %s' % s}
+                          for s in STAT_IDS]
+            modifiers = [{'stat_id': s, 'value': '0.5'} for s in STAT_IDS]
+            return Result([{'num_teams': str(self.num_teams),
+                            'start_date': '2015-09-10',
+                            'end_date': '2015-12-28', 'settings': {
+                'roster_positions': {'roster_position': positions},
+                'stat_categories': {'stats': {'stat': categories}},
+                'stat_modifiers': {'stats': {'stat': modifiers}}}}])
+        if 'fantasysports.leagues.scoreboard' in query:
+            return Result([{'scoreboard': {'matchups': {'matchup': [
+                {'teams': {'team': [self.scoreboard_team(team),
+                                    self.scoreboard_team(team + 1)]}}
+                for team in range(1, self.num_teams, 2)]}}}])
+        rows = []
+        for team_key in re.findall(r"'(\S+\.t\.\d+)'", query):
+            team = int(team_key.rsplit('.', 1)[1])
+            players = [self.player(team, slot)
+                       for slot in range(len(POSITIONS))]
+            if query.split()[1] == '*':
+                rows.append({'team_key': team_key, 'name': 'Team %s' % team,
+                             'roster': {'players': {'player': players}}})
+            else:
+                rows += [{'team_key': team_key,
+                          'roster': {'players': {'player': player}}}
+                         for player in players]
+        return Result(rows)
+
+    def get_token(self, dialog=None):
+        return None
+
+    def get_session(self, url, pool_size=12, refresh=False):
+        return self
+
+    def get(self, url, headers=None):
+        team = int(re.search(r'/(\d+)\?', url).group(1))
+        rows = ''.join(
+            '<tr><td><a data-ys-playernote-view="notes" '
+            'data-ys-playerid="%s">x</a></td><td class="Ta-end Nowrap '
+            'Bdrstart"><div>%s</div></td></tr>' % (team * 100 + slot, slot)
+            for slot in range(len(POSITIONS)))
+        tables = ''.join('<div id="statTable%s-wrap"><table><tr></tr><tr></tr>'
+                         '%s</table></div>' % (n, rows) for n in range(3))
+        return Page('<html><body>%s</body></html>' % tables)
+
+def timed(fn):
+    start = time.time()
+    fn()
+    return (time.time() - start) * 1000
+
+def run(num_teams, latency):
+    """Record fixtures for a league of num_teams and time each stage of the
+    pipeline replaying them
+
+    Returns
+    -------
+    dict
+        The time in milliseconds of each stage
+    """
+    directory = tempfile.mkdtemp()
+    # Time the pipeline itself, not the pacing of requests
+    set_limiter(None)
+    try:
+        set_cache_directory(directory + '/record_cache')
+        recorder = RecordingBackend(SyntheticBackend(num_teams),
+                                    directory + '/fixtures')
+        for week in [1, 2]:
+            load_teams(week, get_proj_points=True, backend=recorder,
+                       league_key=LEAGUE_KEY)
+        get_all_player_points(recorder, None, LEAGUE_KEY)
+
+        backend = ReplayBackend(directory + '/fixtures', latency)
+        set_cache_directory(directory + '/cache')
+        load = lambda week: load_teams(week, backend=backend,
+                                       league_key=LEAGUE_KEY)
+        times = {}
+        times['cold load'] = timed(lambda: load(1))
+        times['warm load'] = timed(lambda: load(1))
+        times['week switch'] = timed(lambda: load(2))
+        times['live refresh'] = timed(lambda: get_all_player_points(
+            backend, None, LEAGUE_KEY, force_refresh=True))
+        times['proj scrape'] = timed(lambda: get_all_points(
+            1, force_refresh=True, backend=backend, league_key=LEAGUE_KEY))
+        return times
+    finally:
+        set_cache_directory()
+        shutil.rmtree(directory)
+
+def import_cost(module):
+    """Import module in a fresh interpreter with an empty home directory
+
+    Returns
+    -------
+    dict
+        The import time in milliseconds, the LAZY_MODULES that were imported
+        and whether the config file was touched
+    """
+    home = tempfile.mkdtemp()
+    script = ('import sys, time, json\n'
+              'start = time.time()\n'
+              'import %s\n'
+              'ms = (time.time() - start) * 1000\n'
+              'loaded = [m for m in %r if m in sys.modules]\n'
+              'print json.dumps({"ms": ms, "loaded": loaded})' %
+              (module, LAZY_MODULES))
+    try:
+        env = dict(os.environ, HOME=home)
+        output = subprocess.check_output(
+            [sys.executable, '-c', script], env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        result = json.loads(output.splitlines()[-1])
+        result['config'] = os.path.exists(os.path.join(home, 'YahooFF'))
+        return result
+    finally:
+        shutil.rmtree(home)
+
+def check_imports():
+    """Print the import time of each of LIGHT_MODULES and return False if any
+    of them imports one of LAZY_MODULES or touches the config file
+    """
+    ok = True
+    print '%-12s%10s  %s' % ('module', 'time', 'eager imports')
+    for module in LIGHT_MODULES:
+        result = import_cost(module)
+        eager = result['loaded'] + (['config file'] if result['config'] else [])
+        ok = ok and not eager
+        print '%-12s%8.1fms  %s' % (module, result['ms'],
+                                     ', '.join(eager) or '-')
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[8, 12, 16, 20, 32])
+    parser.add_argument('--latency', type=float, default=0.1,
+                        help='simulated round trip in seconds')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='append timing spans of every stage to FILE')
+    parser.add_argument('--imports', action='store_true',
+                        help='check the import time of the lightweight '
+                             'modules instead, failing if they import a '
+                             'heavy dependency')
+    args = parser.parse_args()
+    if args.imports:
+        sys.exit(0 if check_imports() else 1)
+    if args.trace is not None:
+        instrument.enable(args.trace)
+    stages = ['cold load', 'warm load', 'week switch', 'live refresh',
+              'proj scrape']
+    print '%6s' % 'teams' + ''.join('%14s' % s for s in stages)
+    for num_teams in args.sizes:
+        times = run(num_teams, args.latency)
+        print '%6d' % num_teams + ''.join('%12.1fms' % times[s] for s in stages)
+
+if __name__ == '__main__':
+    main()
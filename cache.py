@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from data import config
+
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+CACHE_DIRECTORY = os.path.expanduser('~/YahooFF/cache')
+# Seconds each class of query stays fresh, None means it never expires
+TTLS = {'settings': 3 * DAY, 'closed': None, 'live': 5,
+        'projections': HOUR / 4}
+
+
+def content_hash(value):
+    """Return the sha1 hex digest of a response body, or of the json of decoded
+    rows, used to tell an unchanged response from a real change.  Keys are
+    not sorted so the C encoder is used, rows decoded from the same response
+    always serialise the same way
+
+    >>> content_hash([{'a': 2}]) == content_hash([{'a': 2}])
+    True
+    """
+    if not isinstance(value, basestring):
+        value = json.dumps(value)
+    elif isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return hashlib.sha1(value).hexdigest()
+
+
+class QueryCache(object):
+    """On-disk cache of yql query rows stored as one json file per query in
+    ~/YahooFF/cache.  Entries expire after their ttl and the least recently
+    used entries are evicted once the cache grows beyond max_bytes.
+
+    The content hash, final rows and http validators of the last memo_size
+    responses are also kept in memory so a refresh that returns the same
+    content can reuse them instead of parsing a team page or extracting yql
+    rows again.  Callers still set the entry to renew its ttl.  Entries
+    set with persist=False, such as live points that are only fresh for a few
+    seconds, are held in memory only
+    """
+    def __init__(self, directory=None, max_bytes=None, memo_size=512):
+        if directory is None:
+            directory = CACHE_DIRECTORY
+        if max_bytes is None:
+            max_bytes = config.get_cache_size() * 1024 * 1024
+        config.mkdir_p(directory)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self.volatile = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query, league_key=None, week=None):
+        """Return the cache key for a query
+
+        Parameters
+        ----------
+        query: str
+            The yql query
+        league_key: str
+            The league_key the query is for.  Defaults to None
+        week: int
+            The week the query is for.  Defaults to None
+
+        Returns
+        -------
+        str
+            The hex digest used as the file name of the entry
+        """
+        text = '\n'.join(map(str, [' '.join(query.split()), league_key, week]))
+        return hashlib.sha1(text).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """Return the cached rows for key or None if they are missing or have
+        expired
+
+        Parameters
+        ----------
+        key: str
+            The key returned by QueryCache.key
+
+        Returns
+        -------
+        list, None
+            The cached rows
+        """
+        with self._lock:
+            entry = self.volatile.get(key)
+        if entry is not None:
+            expires, rows = entry
+            if expires >= time.time():
+                return rows
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            return None
+        expires = entry['expires']
+        if expires is not None and expires < time.time():
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry['rows']
+
+    def set(self, key, rows, ttl, persist=True):
+        """Store rows under key
+
+        Parameters
+        ----------
+        key: str
+            The key returned by QueryCache.key
+        rows: list
+            The json serialisable rows returned from the query
+        ttl: int, None
+            The number of seconds the entry is fresh for, or None if it never
+            expires
+        persist: bool
+            If False the entry is only held in memory.  It must have a ttl.
+            Defaults to True
+        """
+        expires = None if ttl is None else time.time() + ttl
+        if not persist:
+            with self._lock:
+                self.volatile.pop(key, None)
+                self.volatile[key] = (expires, rows)
+                while len(self.volatile) > self.memo_size:
+                    self.volatile.popitem(last=False)
+            return
+        path = self._path(key)
+        tmp_path = '%s.%s.tmp' % (path, threading.current_thread().ident)
+        # json.dumps uses the C encoder, json.dump the pure python one
+        data = json.dumps({'expires': expires, 'rows': rows})
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.rename(tmp_path, path)
+        self.evict()
+
+    def recall(self, key):
+        """Return the (digest, rows, validators) remembered for key, or None
+
+        Parameters
+        ----------
+        key: str
+            The key returned by QueryCache.key
+
+        Returns
+        -------
+        tuple(str, object, dict), None
+        """
+        with self._lock:
+            return self.memo.get(key)
+
+    def remember(self, key, digest, rows, validators=None):
+        """Keep the parsed rows of the latest response for key in memory
+
+        Parameters
+        ----------
+        key: str
+            The key returned by QueryCache.key
+        digest: str
+            The content_hash of the response
+        rows: object
+            The parsed rows
+        validators: dict
+            The ETag and Last-Modified headers of the response, if any.
+            Defaults to None
+        """
+        with self._lock:
+            self.memo.pop(key, None)
+            self.memo[key] = (digest, rows, validators or {})
+            while len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is smaller
+        than max_bytes
+        """
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+    def clear(self):
+        """Remove every entry from the cache"""
+        with self._lock:
+            self.volatile.clear()
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
+
+_caches = {}
+_directory = CACHE_DIRECTORY
+_caches_lock = threading.Lock()
+
+def get_cache(namespace=None):
+    """Return the shared QueryCache for namespace, creating it on first use.
+    Each namespace, typically a league_key, has its own subdirectory of the
+    cache directory and its own size cap
+
+    Parameters
+    ----------
+    namespace: str
+        The namespace, if None the top level cache directory is used.  Defaults
+        to None
+
+    Returns
+    -------
+    QueryCache
+    """
+    with _caches_lock:
+        if namespace not in _caches:
+            directory = _directory
+            if namespace is not None:
+                directory = os.path.join(directory, namespace)
+            _caches[namespace] = QueryCache(directory)
+        return _caches[namespace]
+
+def set_cache_directory(directory=None):
+    """Move every cache namespace under directory, e.g. a temporary directory
+
+    Parameters
+    ----------
+    directory: str
+        The new cache directory.  If None ~/YahooFF/cache is used.  Defaults to
+        None
+    """
+    global _directory
+    with _caches_lock:
+        _directory = CACHE_DIRECTORY if directory is None else directory
+        _caches.clear()
@@ -0,0 +1,139 @@
+import math
+import threading
+
+from player import to_float
+
+
+class ChangeFeed(object):
+    """Publishes the player and team points of a league that really changed.
+    Every refresh is compared with the last points seen and subscribers are
+    called with the records that differ, never for an unchanged refresh.
+
+    Records are dicts such as
+
+        {'type': 'player', 'league_key': '348.l.102564',
+         'team_key': '348.l.102564.t.1', 'player_id': '8261', 'points': 12.5}
+        {'type': 'team', 'league_key': '348.l.102564',
+         'team_key': '348.l.102564.t.1', 'points': 87.3}
+
+    Parameters
+    ----------
+    league_key: str
+        The league_key in the form XXX.l.XXXX
+    """
+    def __init__(self, league_key):
+        self.league_key = league_key
+        self.player_points = {}
+        self.team_points = {}
+        self.subscribers = []
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Forget the points seen so far, so the next refresh publishes every
+        player and team again
+        """
+        self.player_points = {}
+        self.team_points = {}
+
+    def subscribe(self, callback):
+        """Call callback with the list of records of every real change.
+        Callbacks run on the thread that made the refresh
+
+        Returns
+        -------
+        function
+            callback, for passing to unsubscribe
+        """
+        with self._lock:
+            self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def publish(self, records):
+        if not records:
+            return
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            callback(records)
+
+    def _player(self, team_key, player_id, points):
+        if points is not None and math.isnan(points):
+            points = None
+        if self.player_points.get(player_id, False) == points:
+            return None
+        self.player_points[player_id] = points
+        return {'type': 'player', 'league_key': self.league_key,
+                'team_key': team_key, 'player_id': player_id,
+                'points': points}
+
+    def update(self, team_key, rows):
+        """Compare a team's roster with the last points seen and publish the
+        changes
+
+        Parameters
+        ----------
+        team_key: str
+            The team the rows belong to
+        rows: list
+            The roster.players.player rows of the team
+
+        Returns
+        -------
+        list[dict]
+            A player record for each player whose points changed followed by
+            a team record if the total of the starting players changed
+        """
+        records = []
+        total = 0.
+        for row in rows:
+            player = row['roster']['players']['player']
+            points = to_float(player.get('player_points', {}).get('total'))
+            if not math.isnan(points) and player.get(
+                    'selected_position', {}).get('position') != 'BN':
+                total += points
+            record = self._player(team_key, player['player_id'], points)
+            if record is not None:
+                records.append(record)
+        total = round(total, 2)
+        if self.team_points.get(team_key) != total:
+            self.team_points[team_key] = total
+            records.append({'type': 'team', 'league_key': self.league_key,
+                            'team_key': team_key, 'points': total})
+        self.publish(records)
+        return records
+
+    def update_points(self, player_points, rosters=None):
+        """Compare player_points with the last points seen and publish the
+        changes
+
+        Parameters
+        ----------
+        player_points: dict
+            The dict of player_id and player_points
+        rosters: dict
+            The dict of team_key and its player_ids, used to fill in the
+            team_key of each record.  Defaults to None
+
+        Returns
+        -------
+        dict
+            The dict of player_id and player_points of only the players whose
+            points changed
+        """
+        teams = {}
+        for team_key, player_ids in (rosters or {}).iteritems():
+            for player_id in player_ids:
+                teams[player_id] = team_key
+        records = []
+        for player_id, points in player_points.iteritems():
+            record = self._player(teams.get(player_id), player_id, points)
+            if record is not None:
+                records.append(record)
+        self.publish(records)
+        return dict((r['player_id'], player_points[r['player_id']])
+                    for r in records)
@@ -2,12 +2,30 @@ import ConfigParser
 import os
 import errno
 import shutil
+import threading
 
 config = ConfigParser.ConfigParser()
 default = os.path.expanduser('~/YahooFF/config')
+_loaded = False
+_lock = threading.Lock()
+
+def load():
+    """Read the config file, first creating it from default_config if it does
+    not exist.  Only the first call touches the disk so every getter can call
+    it and importing this module stays free of file I/O
+    """
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            if not os.path.exists(default):
+                set_default_config()
+            config.read(default)
+            _loaded = True
 
 def set_default_config():
-    mkdir_p('~/YahooFF')
+    mkdir_p(os.path.expanduser('~/YahooFF'))
     src = os.path.join(os.path.dirname(__file__), 'default_config')
     dst = os.path.expanduser('~/YahooFF/config')
     shutil.copy(src, dst)
@@ -22,13 +40,14 @@ def mkdir_p(path):
             raise
 
 def config_map(section, key):
+    load()
     try:
         value = config.get(section, key)
         if value == '':
             value = raw_input('Enter %s %s:' % (section, key))
             config.set(section, key, value)
-        with open(default, 'w') as f:
-            config.write(f)
+            with open(default, 'w') as f:
+                config.write(f)
     except ConfigParser.NoOptionError:
         value = None
     return value
@@ -75,6 +94,59 @@ def get_gui_parameter(query=None):
     """
     return int(get_general_one_parameter(query, 'Parameters', 'refresh_rate'))
 
+def get_max_workers(default=12):
+    """Fetch the maximum number of concurrent yql queries from the config file
+
+    Parameters
+    ----------
+    default: int
+        The value to use if max_workers is not in the config file.  Defaults to
+        12
+
+    Returns
+    -------
+    int
+        The maximum number of worker threads used to fetch team data
+    """
+    return get_int_parameter('max_workers', default)
+
+def get_batch_size(default=12):
+    """Fetch the maximum number of teams to request in a single batched yql
+    query from the config file
+
+    Parameters
+    ----------
+    default: int
+        The value to use if batch_size is not in the config file.  Defaults to
+        12
+
+    Returns
+    -------
+    int
+        The maximum number of team_keys in one team_key IN (...) query
+    """
+    return get_int_parameter('batch_size', default)
+
+def get_cache_size(default=50):
+    """Fetch the maximum size of the on-disk query cache from the config file
+
+    Parameters
+    ----------
+    default: int
+        The value to use if cache_size is not in the config file.  Defaults to
+        50
+
+    Returns
+    -------
+    int
+        The maximum size of ~/YahooFF/cache in megabytes
+    """
+    return get_int_parameter('cache_size', default)
+
+def get_int_parameter(key, default):
+    value = config_map('Parameters', key)
+    return default if value is None else int(value)
+
 def get_league(query=None):
     return get_general_one_parameter(query, 'Fantasy', 'league')
 
@@ -84,12 +156,77 @@ def get_league_number(query=None):
 def get_league_key():
     return '%s.l.%s' % (get_league(), get_league_number())
 
+def get_league_keys():
+    """Get the league_keys of every league to monitor.  These are read from the
+    comma separated leagues option of the Fantasy section, e.g.
+    leagues = 348.l.1000, 348.l.2000, falling back to get_league_key() if the
+    option is missing
+
+    Returns
+    -------
+    list[str]
+        The league_keys in the form XXX.l.XXXX
+    """
+    load()
+    try:
+        leagues = config.get('Fantasy', 'leagues')
+    except ConfigParser.NoOptionError:
+        leagues = ''
+    league_keys = [key.strip() for key in leagues.split(',') if key.strip()]
+    return league_keys or [get_league_key()]
+
+def get_request_budget(default=2000):
+    """Fetch the number of Yahoo requests allowed per hour across every league
+    from the config file
+
+    Parameters
+    ----------
+    default: int
+        The value to use if request_budget is not in the config file.  Defaults
+        to 2000
+
+    Returns
+    -------
+    int
+        The maximum number of requests per hour
+    """
+    return get_int_parameter('request_budget', default)
+
+def get_requests_per_minute(default=120):
+    """Fetch the rate at which requests are sent to Yahoo from the config file
+
+    Parameters
+    ----------
+    default: int
+        The value to use if requests_per_minute is not in the config file.
+        Defaults to 120
+
+    Returns
+    -------
+    int
+        The number of requests per minute, 0 turns rate limiting off
+    """
+    return get_int_parameter('requests_per_minute', default)
+
+def get_request_burst(default=10):
+    """Fetch the number of requests that may be sent at once after a quiet
+    spell from the config file
+
+    Parameters
+    ----------
+    default: int
+        The value to use if request_burst is not in the config file.  Defaults
+        to 10
+
+    Returns
+    -------
+    int
+        The size of the rate limiter's token bucket
+    """
+    return get_int_parameter('request_burst', default)
+
 def get_general_one_parameter(query, section, key):
     value = config_map(section, key)
     if value == '':
         value = raw_input('Enter %s:' % key) if query is None else query()
     return value
-
-if not os.path.exists(default):
-    set_default_config()
-config.read(default)
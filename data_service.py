@@ -0,0 +1,372 @@
+import math
+import time
+
+from PySide import QtCore
+
+from data import config
+from changefeed import ChangeFeed
+from ratelimit import priority, register, allow, LIVE
+from refresh_schedule import RefreshSchedule
+from scoreboard import ScoreboardMonitor
+from simulate import PositionModel, matchup_odds
+
+from yahoo_tools import (iter_teams, get_league_settings,
+                         get_all_player_points, is_closed_week)
+from projected_stats import get_all_points
+
+# Milliseconds to wait for the worker's current fetch when stopping
+STOP_TIMEOUT = 2000
+
+
+class DataWorker(QtCore.QObject):
+    """Runs the yql queries for DataService on its worker thread.  Work for a
+    request that has been superseded by a newer one is abandoned
+    """
+    team_loaded = QtCore.Signal(int, int, object)
+    teams_loaded = QtCore.Signal(int, object)
+    proj_points_loaded = QtCore.Signal(int, object)
+    points_loaded = QtCore.Signal(int, object, object)
+    scoreboard_loaded = QtCore.Signal(int, object, object, object)
+    settings_loaded = QtCore.Signal(object)
+    failed = QtCore.Signal(int, object)
+
+    def __init__(self, service):
+        super(DataWorker, self).__init__()
+        self.service = service
+
+    def stale(self, request_id):
+        return request_id != self.service.request_id
+
+    @QtCore.Slot()
+    def load_settings(self):
+        service = self.service
+        try:
+            service.settings = get_league_settings(
+                service.backend, service.token, service.league_key)
+        except Exception as e:
+            self.failed.emit(-1, e)
+        else:
+            self.settings_loaded.emit(service.settings)
+
+    @QtCore.Slot(int, object, bool)
+    def load_week(self, request_id, week, get_proj_points):
+        service = self.service
+        if self.stale(request_id):
+            return
+        teams = []
+        try:
+            num_teams = service.settings['num_teams']
+            for col, team in enumerate(iter_teams(
+                    service.backend, service.token, service.league_key, week,
+                    num_teams)):
+                if self.stale(request_id):
+                    return
+                teams.append(team)
+                self.team_loaded.emit(request_id, col, team)
+            self.teams_loaded.emit(request_id, teams)
+            if get_proj_points and not self.stale(request_id):
+                proj_points = get_all_points(
+                    week, num_teams, closed=is_closed_week(week),
+                    backend=service.backend,
+                    league_key=service.league_key)
+                self.proj_points_loaded.emit(request_id, proj_points)
+        except Exception as e:
+            self.failed.emit(request_id, e)
+
+    @QtCore.Slot(int, object, object)
+    def reload_teams(self, request_id, week, team_keys):
+        service = self.service
+        try:
+            for team in iter_teams(
+                    service.backend, service.token, service.league_key, week,
+                    force_refresh=True, team_keys=team_keys):
+                if self.stale(request_id):
+                    return
+                col = service.settings['team_keys'].index(team.team_key)
+                self.team_loaded.emit(request_id, col, team)
+        except Exception as e:
+            self.failed.emit(request_id, e)
+
+    @QtCore.Slot(int, object)
+    def load_points(self, request_id, team_keys):
+        service = self.service
+        try:
+            if not self.stale(request_id):
+                rosters = {}
+                with priority(LIVE):
+                    player_points = get_all_player_points(
+                        service.backend, service.token, service.league_key,
+                        service.settings['num_teams'], team_keys=team_keys,
+                        rosters=rosters, week=service.week)
+                player_points = service.feed.update_points(player_points,
+                                                           rosters)
+                self.points_loaded.emit(request_id, player_points, rosters)
+        except Exception as e:
+            self.failed.emit(request_id, e)
+        finally:
+            service.points_pending = False
+
+    @QtCore.Slot(int)
+    def load_model(self, request_id):
+        from season import read_season
+
+        service = self.service
+        try:
+            season = read_season(service.league_key)
+            service.model = PositionModel.from_season(dict(
+                (week, teams) for week, teams in season.iteritems()
+                if is_closed_week(week)))
+        except Exception as e:
+            self.failed.emit(request_id, e)
+
+    @QtCore.Slot(int, object)
+    def load_scoreboard(self, request_id, teams):
+        service = self.service
+        try:
+            if not self.stale(request_id):
+                rosters = {}
+                matchups, changed, player_points = service.scoreboard.tick(
+                    rosters=rosters)
+                odds = matchup_odds(teams, matchups, service.model)
+                self.scoreboard_loaded.emit(request_id, matchups, changed,
+                                            odds)
+                if changed:
+                    player_points = service.feed.update_points(player_points,
+                                                               rosters)
+                    self.points_loaded.emit(request_id, player_points, rosters)
+        except Exception as e:
+            self.failed.emit(request_id, e)
+        finally:
+            service.points_pending = False
+
+class DataService(QtCore.QObject):
+    """Fetches league data on a background QThread and delivers the results
+    through the signals of DataService.worker.  Every load_week call starts a
+    new request and results belonging to older requests are dropped.
+
+    Points refreshes are passed through feed, a ChangeFeed, so points_loaded
+    only carries the players whose points changed and other consumers can
+    subscribe to the same changes.
+
+    The win probabilities delivered with the scoreboard sample model, which
+    uses the default spreads until load_model has read the projection errors
+    of the closed weeks saved on disk by season.load_season
+
+    Parameters
+    ----------
+    backend: backends.Backend
+        The source of the league data
+    token: yql.YahooToken
+        The token returned by backend.get_token
+    league_key: str
+        The league_key in the form XXX.l.XXXX
+    """
+    _load_settings = QtCore.Signal()
+    _load_week = QtCore.Signal(int, object, bool)
+    _load_points = QtCore.Signal(int, object)
+    _reload_teams = QtCore.Signal(int, object, object)
+    _load_scoreboard = QtCore.Signal(int, object)
+    _load_model = QtCore.Signal(int)
+
+    def __init__(self, backend, token, league_key, parent=None):
+        super(DataService, self).__init__(parent)
+        self.backend = backend
+        self.token = token
+        self.league_key = league_key
+        register(league_key)
+        self.settings = None
+        self.week = None
+        self.request_id = 0
+        self.points_pending = False
+        self.model = PositionModel()
+        self.model_requested = False
+        self.scoreboard = ScoreboardMonitor(backend, token, league_key)
+        self.feed = ChangeFeed(league_key)
+        self.thread = QtCore.QThread()
+        self.worker = DataWorker(self)
+        self.worker.moveToThread(self.thread)
+        self._load_settings.connect(self.worker.load_settings)
+        self._load_week.connect(self.worker.load_week)
+        self._load_points.connect(self.worker.load_points)
+        self._reload_teams.connect(self.worker.reload_teams)
+        self._load_scoreboard.connect(self.worker.load_scoreboard)
+        self._load_model.connect(self.worker.load_model)
+        self.thread.start()
+
+    def load_settings(self):
+        """Fetch the league settings, delivered by settings_loaded.  Must be
+        called before any other load so the worker knows the league size
+        """
+        self._load_settings.emit()
+
+    def load_week(self, week, get_proj_points=False):
+        """Fetch the teams for week, delivered team by team by team_loaded and
+        then all together by teams_loaded.  Any request still in progress is
+        abandoned
+
+        Parameters
+        ----------
+        week: int
+            The week to load
+        get_proj_points: bool
+            If True the projected points are scraped once the teams have loaded
+            and delivered by proj_points_loaded.  Defaults to False
+
+        Returns
+        -------
+        int
+            The id of the new request
+        """
+        self.request_id += 1
+        self.week = week
+        self.feed.reset()
+        self._load_week.emit(self.request_id, week, get_proj_points)
+        return self.request_id
+
+    def load_points(self, team_keys=None):
+        """Fetch the player_points for the current request, delivered by
+        points_loaded.  Skipped if the previous fetch has not finished yet
+
+        Parameters
+        ----------
+        team_keys: list[str]
+            Only fetch these teams.  If None every team is fetched.  Defaults
+            to None
+        """
+        if self.points_pending:
+            return
+        self.points_pending = True
+        self._load_points.emit(self.request_id, team_keys)
+
+    def reload_teams(self, team_keys):
+        """Reload the rosters of team_keys for the current week, e.g. after a
+        roster move, delivered by team_loaded with each team's column
+
+        Parameters
+        ----------
+        team_keys: list[str]
+            The teams to reload
+        """
+        self._reload_teams.emit(self.request_id, self.week, team_keys)
+
+    def load_scoreboard(self, teams):
+        """Fetch the league scoreboard and simulate the win probability of
+        each matchup from teams, delivered by scoreboard_loaded, and the
+        player_points of the teams in changed matchups, delivered by
+        points_loaded.  Skipped if the previous fetch has not finished yet
+
+        Parameters
+        ----------
+        teams: list[Team]
+            The loaded teams, their projected and current points are simulated
+        """
+        if self.points_pending:
+            return
+        self.points_pending = True
+        self._load_scoreboard.emit(self.request_id, list(teams))
+
+    def load_model(self):
+        """Replace model with one sampling the projection errors of the closed
+        weeks saved on disk, read once on the worker thread.  No requests are
+        made, the default spreads are kept for weeks that were never saved
+        """
+        if self.model_requested:
+            return
+        self.model_requested = True
+        self._load_model.emit(self.request_id)
+
+    def refresh_cost(self, num_teams=None):
+        """Return the number of requests a points refresh of num_teams teams
+        makes, all of the teams if num_teams is None
+        """
+        if self.settings is None:
+            return 1
+        if num_teams is None:
+            num_teams = self.settings['num_teams']
+        return int(math.ceil(float(num_teams) / config.get_batch_size()))
+
+    def stop(self):
+        """Stop the worker thread, waiting at most STOP_TIMEOUT milliseconds
+        for the current fetch.  A fetch still running after that is abandoned,
+        its results are stale and dropped
+
+        Returns
+        -------
+        bool
+            True if the worker thread has stopped
+        """
+        self.request_id += 1
+        self.thread.quit()
+        return self.thread.wait(STOP_TIMEOUT)
+
+class LeagueScheduler(QtCore.QObject):
+    """Interleaves the points refreshes of several leagues on a single timer.
+    Each league has a RefreshSchedule deciding when it is next due and which of
+    its teams to refresh, and is only refreshed while its share of the
+    request budget of the shared RateLimiter allows.  Leagues start offset
+    from each other across refresh_rate so their refreshes do not coincide
+
+    In scoreboard_mode each tick makes the single scoreboard query and only
+    pulls the rosters of matchups whose score changed.  Otherwise the
+    scoreboard is only queried when the league's RefreshSchedule wants to
+    know which teams have finished their games
+
+    Parameters
+    ----------
+    widgets: list
+        Objects with league_key, service, update_player_points(team_keys),
+        update_scoreboard() and a refreshed signal carrying the changes of
+        each refresh, one per league
+    refresh_rate: int
+        The time in milliseconds between refreshes while points are changing
+    """
+    def __init__(self, widgets, refresh_rate, parent=None):
+        super(LeagueScheduler, self).__init__(parent)
+        self.widgets = widgets
+        self.scoreboard_mode = False
+        self.schedules = {}
+        self.due = {}
+        now = time.time()
+        for i, widget in enumerate(widgets):
+            schedule = RefreshSchedule(refresh_rate)
+            self.schedules[widget.league_key] = schedule
+            self.due[widget.league_key] = (
+                now + refresh_rate * i / 1000. / max(len(widgets), 1))
+            widget.refreshed.connect(schedule.record)
+            widget.service.worker.settings_loaded.connect(
+                lambda settings, s=schedule: s.set_season(settings['season']))
+            widget.service.worker.scoreboard_loaded.connect(
+                lambda request_id, matchups, changed, odds, s=schedule:
+                s.record_scoreboard(matchups))
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(0)
+
+    def tick(self):
+        """Refresh every league that is due and has budget left, then sleep
+        until the next league is due
+        """
+        now = time.time()
+        for widget in self.widgets:
+            league_key = widget.league_key
+            if self.due[league_key] > now or widget.service.settings is None:
+                continue
+            schedule = self.schedules[league_key]
+            self.due[league_key] = now + schedule.interval() / 1000.
+            if is_closed_week(widget.service.week):
+                # The points of a finished week no longer change
+                continue
+            if self.scoreboard_mode or schedule.scoreboard_due():
+                if allow(league_key):
+                    widget.update_scoreboard()
+                continue
+            team_keys = schedule.teams_due(widget.service.settings['team_keys'])
+            cost = widget.service.refresh_cost(len(team_keys))
+            if team_keys and allow(league_key, cost):
+                widget.update_player_points(team_keys)
+        wait = min(self.due.values()) - time.time() if self.due else 1
+        self.timer.start(max(int(wait * 1000), 100))
+
+    def stop(self):
+        self.timer.stop()
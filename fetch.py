@@ -0,0 +1,122 @@
+import time
+from multiprocessing.pool import ThreadPool
+
+from data import config
+from ratelimit import inherit, Throttled, BudgetExhausted
+
+
+def retry(fn, retries=3, backoff=0.5, exceptions=(Exception,), fatal=()):
+    """Wrap fn so that a failed call is retried with exponential backoff
+
+    Parameters
+    ----------
+    fn: function
+        The function to wrap
+    retries: int
+        The number of times to retry fn after the first failure.  Defaults to 3
+    backoff: float
+        The number of seconds to wait before the first retry, doubled after
+        every subsequent failure.  Defaults to 0.5
+    exceptions: tuple
+        The exception types that trigger a retry.  Defaults to (Exception,)
+    fatal: tuple
+        The exception types that are re-raised at once even if they are also
+        in exceptions.  Defaults to ()
+
+    Returns
+    -------
+    function
+        The wrapped function.  The last exception is re-raised once retries
+        are exhausted
+    """
+    def wrapped(*args, **kwargs):
+        delay = backoff
+        for attempt in range(retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except fatal:
+                raise
+            except exceptions:
+                if attempt == retries:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+    return wrapped
+
+def fetch_all(fn, items, max_workers=None, retries=3, backoff=0.5,
+              fatal=()):
+    """Call fn on every item in items using a bounded pool of worker threads,
+    retrying failed calls with backoff
+
+    Parameters
+    ----------
+    fn: function
+        A function taking a single item, typically running one yql query
+    items: list
+        The items to call fn on, e.g. a list of queries
+    max_workers: int
+        The maximum number of concurrent calls.  If None then
+        config.get_max_workers() is used.  Defaults to None
+    retries: int
+        The number of retries for each failed call.  Defaults to 3
+    backoff: float
+        The initial backoff in seconds between retries.  Defaults to 0.5
+    fatal: tuple
+        Exception types that are raised at once instead of retried.  Defaults
+        to ()
+
+    Returns
+    -------
+    list
+        The results of fn in the same order as items
+    """
+    return list(fetch_iter(fn, items, max_workers, retries, backoff, fatal))
+
+def fetch_iter(fn, items, max_workers=None, retries=3, backoff=0.5,
+               fatal=()):
+    """As fetch_all but yield each result as soon as it and every result before
+    it have arrived.  The calls run at the ratelimit priority of the caller
+    and Throttled or BudgetExhausted from the rate limiter are not retried
+
+    Parameters
+    ----------
+    fn: function
+        A function taking a single item, typically running one yql query
+    items: list
+        The items to call fn on, e.g. a list of queries
+    max_workers: int
+        The maximum number of concurrent calls.  If None then
+        config.get_max_workers() is used.  Defaults to None
+    retries: int
+        The number of retries for each failed call.  Defaults to 3
+    backoff: float
+        The initial backoff in seconds between retries.  Defaults to 0.5
+    fatal: tuple
+        Exception types that are raised at once instead of retried, as well
+        as Throttled and BudgetExhausted.  Defaults to ()
+
+    Yields
+    ------
+    object
+        The results of fn in the same order as items
+    """
+    items = list(items)
+    if not items:
+        return
+    if max_workers is None:
+        max_workers = config.get_max_workers()
+    # The rate limiter has already retried throttled requests
+    fn = inherit(retry(fn, retries, backoff,
+                       fatal=(Throttled, BudgetExhausted) + tuple(fatal)))
+    max_workers = max(1, min(max_workers, len(items)))
+    if max_workers == 1:
+        for item in items:
+            yield fn(item)
+        return
+    pool = ThreadPool(max_workers)
+    try:
+        for result in pool.imap(fn, items):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,134 @@
+"""Lightweight timing spans for the data pipeline.
+
+Recording is off until enable() is called, and until then span() returns a
+shared no-op object so instrumented code pays only a function call::
+
+    enable('trace.jsonl')
+    with span('construct_team') as s:
+        ...
+        s.add(objects=len(players))
+"""
+import json
+import time
+import threading
+from collections import deque
+
+
+class Span(object):
+    __slots__ = ('name', 'start', 'duration', 'counts', 'recorder')
+
+    def __init__(self, recorder, name, counts):
+        self.recorder = recorder
+        self.name = name
+        self.counts = counts
+        self.start = None
+        self.duration = None
+
+    def add(self, **counts):
+        """Add to the counts recorded with the span e.g. bytes or objects"""
+        for k, v in counts.iteritems():
+            self.counts[k] = self.counts.get(k, 0) + v
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.time() - self.start
+        self.recorder.record(self)
+
+    def to_dict(self):
+        return dict(name=self.name, start=self.start,
+                    ms=self.duration * 1000, **self.counts)
+
+class NullSpan(object):
+    """Stand in for Span while recording is disabled"""
+    __slots__ = ()
+
+    def add(self, **counts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+class Recorder(object):
+    """Keeps the most recent spans in a ring buffer and optionally appends
+    every span to a json lines file
+
+    Parameters
+    ----------
+    path: str
+        The json lines file to append spans to.  If None spans are only kept
+        in memory.  Defaults to None
+    capacity: int
+        The number of spans kept in the ring buffer.  Defaults to 1000
+    """
+    def __init__(self, path=None, capacity=1000):
+        self.spans = deque(maxlen=capacity)
+        self.last = {}
+        self._lock = threading.Lock()
+        self._file = None if path is None else open(path, 'a')
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+            self.last[span.name] = span
+            if self._file is not None:
+                self._file.write(json.dumps(span.to_dict()) + '\n')
+                self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+_NULL = NullSpan()
+_recorder = None
+
+def span(name, **counts):
+    """Return a context manager timing the block it wraps as the span name
+
+    Parameters
+    ----------
+    name: str
+        The name of the pipeline stage
+    counts:
+        Initial counts recorded with the span
+
+    Returns
+    -------
+    Span, NullSpan
+    """
+    if _recorder is None:
+        return _NULL
+    return Span(_recorder, name, counts)
+
+def enabled():
+    return _recorder is not None
+
+def enable(path=None, capacity=1000):
+    """Start recording spans, see Recorder for the parameters"""
+    global _recorder
+    disable()
+    _recorder = Recorder(path, capacity)
+    return _recorder
+
+def disable():
+    """Stop recording spans and close the json lines file"""
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+    _recorder = None
+
+def last(name):
+    """Return the most recent span called name, None if there is none"""
+    if _recorder is None:
+        return None
+    return _recorder.last.get(name)
+
+def recent():
+    """Return the spans in the ring buffer, oldest first"""
+    return [] if _recorder is None else list(_recorder.spans)
@@ -0,0 +1,186 @@
+"""Optimal lineups from projected points.  Filling the starting slots of a
+roster is an assignment problem, slots x players with the negated projected
+points as the cost, solved exactly with the Hungarian algorithm so flex slots
+such as W/R/T are filled optimally without trying every combination.
+"""
+import math
+
+# Slots that are not starting slots
+BENCH_SLOTS = ('BN', 'IR')
+# The positions abbreviated in flex slot names such as W/R/T or Q/W/R/T
+FLEX_CODES = {'Q': 'QB', 'W': 'WR', 'R': 'RB', 'T': 'TE', 'K': 'K'}
+# The cost of putting a player in a slot they cannot play
+INELIGIBLE = 1e6
+
+
+def player_positions(player):
+    """Return the set of positions player can play, from display_position
+    which lists several positions separated by commas e.g. 'WR,TE'
+    """
+    return set(p.strip() for p in (player.position or '').split(','))
+
+def slot_positions(slot):
+    """Return the set of positions that can fill slot
+
+    >>> sorted(slot_positions('W/R/T'))
+    ['RB', 'TE', 'WR']
+    >>> sorted(slot_positions('QB'))
+    ['QB']
+    """
+    if '/' in slot:
+        return set(FLEX_CODES.get(code, code) for code in slot.split('/'))
+    return set([slot])
+
+def starting_slots(roster_positions):
+    """Return the roster_positions that are starting slots"""
+    return [slot for slot in roster_positions if slot not in BENCH_SLOTS]
+
+def projected(player):
+    """Return the projected points of player, 0 if they have none"""
+    points = player.proj_points
+    if points is None or math.isnan(points):
+        return 0.
+    return points
+
+def assign(cost):
+    """Solve the assignment problem for cost, a list of n rows each of m >= n
+    columns, with the Hungarian algorithm in O(n^2 m)
+
+    Parameters
+    ----------
+    cost: list[list[float]]
+        The cost of assigning each row to each column
+
+    Returns
+    -------
+    list[int]
+        The column assigned to each row, minimising the total cost
+
+    >>> assign([[4, 1, 3], [2, 0, 5]])
+    [1, 0]
+    """
+    n, m = len(cost), len(cost[0]) if cost else 0
+    inf = float('inf')
+    u = [0.] * (n + 1)
+    v = [0.] * (m + 1)
+    owner = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in xrange(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            row = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in xrange(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in xrange(m + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    result = [0] * n
+    for j in xrange(1, m + 1):
+        if owner[j]:
+            result[owner[j] - 1] = j - 1
+    return result
+
+class Lineup(object):
+    """The optimal starting lineup of a team
+
+    Attributes
+    ----------
+    team: Team
+        The team the lineup is for
+    starters: list[tuple(str, Player)]
+        Each starting slot and the player chosen for it, None if no player on
+        the roster can fill it
+    points: float
+        The projected points of the optimal lineup
+    current: float
+        The projected points of the team's current starters
+    """
+    __slots__ = ('team', 'starters', 'points', 'current')
+
+    def __init__(self, team, starters, points, current):
+        self.team = team
+        self.starters = starters
+        self.points = points
+        self.current = current
+
+    @property
+    def left_on_bench(self):
+        """The projected points the current lineup leaves on the bench"""
+        return max(self.points - self.current, 0.)
+
+    def changes(self):
+        """Return the players to start that are not currently starting"""
+        return [player for _, player in self.starters
+                if player is not None and player.selected_position in
+                BENCH_SLOTS]
+
+    def __repr__(self):
+        return 'Lineup(%s, %.2f)' % (self.team.name, self.points)
+
+def optimal_lineup(team, roster_positions):
+    """Choose the starters of team that maximise its projected points
+
+    Parameters
+    ----------
+    team: Team
+        The team, its players' proj_points are used
+    roster_positions: list[str]
+        The roster slots in roster order as returned by get_league_settings,
+        bench slots are ignored
+
+    Returns
+    -------
+    Lineup
+    """
+    slots = starting_slots(roster_positions)
+    players = [p for p in team.players if p.selected_position != 'IR']
+    eligible = [player_positions(p) for p in players]
+    # Pad with empty columns so every slot can be assigned
+    width = max(len(players), len(slots))
+    cost = []
+    for slot in slots:
+        positions = slot_positions(slot)
+        row = [-projected(p) if positions & eligible[j] else INELIGIBLE
+               for j, p in enumerate(players)]
+        cost.append(row + [0.] * (width - len(players)))
+    starters = []
+    points = 0.
+    for slot, col in zip(slots, assign(cost)):
+        player = players[col] if col < len(players) else None
+        if player is not None and cost[len(starters)][col] >= INELIGIBLE:
+            player = None
+        starters.append((slot, player))
+        if player is not None:
+            points += projected(player)
+    current = sum(projected(p) for p in team.played
+                  if p.selected_position not in BENCH_SLOTS)
+    return Lineup(team, starters, points, current)
+
+def league_lineups(teams, roster_positions):
+    """Return the optimal Lineup of every team keyed by team_key"""
+    return dict((team.team_key, optimal_lineup(team, roster_positions))
+                for team in teams)
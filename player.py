@@ -1,69 +1,120 @@
-import pandas as pd
+from array import array
 
 
+NAN = float('nan')
+
+def to_float(value):
+    """Convert a yql stat or points value to a float, NaN if it is missing
+
+    >>> to_float(u'12.5')
+    12.5
+    >>> to_float(u'-')
+    nan
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+class StatIndex(object):
+    """Fixed mapping of the league's stat_ids to positions in each player's stat
+    array, shared by every Player loaded for the league
+    """
+    __slots__ = ('stat_ids', 'positions')
+
+    def __init__(self, stat_ids):
+        self.stat_ids = list(stat_ids)
+        self.positions = dict((s, i) for i, s in enumerate(self.stat_ids))
+
+    def __len__(self):
+        return len(self.stat_ids)
+
+    def pack(self, stats):
+        """Return an array of the values in stats ordered by stat_ids.  Stats
+        missing from stats are NaN and stats not in the index are dropped
+
+        Parameters
+        ----------
+        stats: dict
+            The dict mapping stat_id to value
+
+        Returns
+        -------
+        array.array
+        """
+        values = array('d', [NAN]) * len(self.stat_ids)
+        for stat_id, value in stats.iteritems():
+            i = self.positions.get(stat_id)
+            if i is not None:
+                values[i] = to_float(value)
+        return values
+
 class Player(object):
-    def __init__(self, **kwargs):
-        self._name = None
-        self._player_points = None
+    __slots__ = ('player_id', 'first_name', 'last_name', 'full_name',
+                 'position', 'selected_position', 'bye_week', 'player_points',
+                 'proj_points', 'stats', 'stat_index')
+
+    def __init__(self, stat_index=None, **kwargs):
+        self.player_id = kwargs.get('player_id')
+        name = kwargs.get('name') or {}
+        self.first_name = name.get('first')
+        self.last_name = name.get('last')
+        self.full_name = name.get('full')
+        self.position = kwargs.get('display_position')
+        self.selected_position = kwargs.get(
+            'selected_position', {}).get('position')
+        self.bye_week = kwargs.get('bye_weeks', {}).get('week')
+        self.player_points = kwargs.get('player_points')
+        if self.player_points is not None:
+            self.player_points = to_float(self.player_points['total'])
         self.proj_points = None
-        self._player_id = None
-        for k, v in kwargs.iteritems():
-            setattr(self, '_' + k, v)
-        if hasattr(self, '_bye_weeks'):
-            self.bye_week = self._bye_weeks['week']
-        if hasattr(self, '_player_points'):
-            self._player_points = self._player_points['total']
-        if hasattr(self, '_selected_position'):
-            self.selected_position = self._selected_position['position']
-        if hasattr(self, '_name'):
-            self.full_name = self._name['full']
+        stats = kwargs.get('stats', {})
+        if stat_index is None:
+            stat_index = StatIndex(sorted(stats))
+        self.stat_index = stat_index
+        self.stats = stat_index.pack(stats)
 
     @property
     def name(self):
-        return self._name
+        return dict(first=self.first_name, last=self.last_name,
+                    full=self.full_name)
 
     def set_last_name(self, value):
-        self._name['last'] = value
-
-    @property
-    def player_points(self):
-        return self._player_points
+        self.last_name = value
 
     def set_player_points(self, value):
-        self._player_points = value
+        self.player_points = value
 
-    @property
-    def player_id(self):
-        return self._player_id
+    def stat(self, stat_id):
+        i = self.stat_index.positions.get(stat_id)
+        return None if i is None else self.stats[i]
 
     @property
     def initial(self):
-        if self.name['last'] is None:
-            result = self.name['full']
+        if self.last_name is None:
+            result = self.full_name
         else:
-            result = self.name['first'][0] + '.' + self.name['last']
+            result = self.first_name[0] + '.' + self.last_name
         return result
 
     def __repr__(self):
         return 'Player(%s)' % self.initial
 
 class Team(object):
+    __slots__ = ('players', 'team_key', 'name', 'bench', 'played')
+
     def __init__(self, players, **kwargs):
         self.players = players
-        self._name = None
-        for k, v in kwargs.iteritems():
-            setattr(self, '_' + k, v)
-        self.bench = self.played = []
+        self.team_key = kwargs.get('team_key')
+        self.name = kwargs.get('name')
+        self.bench = []
+        self.played = []
         for player in players:
             attr = self.bench if player.selected_position == 'BN' else self.played
             attr.append(player)
 
     def __repr__(self):
-        return 'Team(%s)' % self._name
-
-    @property
-    def name(self):
-        return self._name
+        return 'Team(%s)' % self.name
 
     def proj_points(self):
         return sum([player.proj_points for player in self.played])
@@ -71,7 +122,120 @@ class Team(object):
     def points(self):
         return sum([player.player_points for player in self.played])
 
+class PlayerIndex(object):
+    """League-wide mapping of player_id to the (col, row, Player) holding it so
+    that point, projection and stat updates are scattered straight to the
+    players they name instead of searching every team
+
+    Parameters
+    ----------
+    teams: list[Team]
+        The teams of the league in column order.  Defaults to none
+    """
+    def __init__(self, teams=()):
+        self.teams = []
+        self.entries = {}
+        for team in teams:
+            self.add_team(team)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, player_id):
+        return player_id in self.entries
+
+    def get(self, player_id):
+        """Return the (col, row, Player) of player_id or None"""
+        return self.entries.get(player_id)
+
+    def add_team(self, team):
+        """Append team as the next column and index its players"""
+        self.teams.append(team)
+        self._index(len(self.teams) - 1)
+
+    def replace_team(self, col, team):
+        """Replace the team in column col, e.g. after a roster move, dropping
+        the players it no longer has from the index
+        """
+        for player in self.teams[col].players:
+            entry = self.entries.get(player.player_id)
+            if entry is not None and entry[0] == col:
+                del self.entries[player.player_id]
+        self.teams[col] = team
+        self._index(col)
+
+    def _index(self, col):
+        for row, player in enumerate(self.teams[col].players):
+            self.entries[player.player_id] = (col, row, player)
+
+    def scatter(self, attr, values, fill=None, fill_missing=False):
+        """Set attr on every indexed player named in values
+
+        Parameters
+        ----------
+        attr: str
+            The Player attribute to set e.g. 'player_points'
+        values: dict
+            The dict of player_id and value.  Players that are not indexed are
+            ignored
+        fill: object
+            The value given to indexed players missing from values if
+            fill_missing is True.  Defaults to None
+        fill_missing: bool
+            If True every indexed player missing from values is set to fill.
+            Defaults to False
+
+        Returns
+        -------
+        tuple(list, dict)
+            The (row, col) of each player whose value changed, and a dict of
+            team_key to True if any of its players changed for every team with
+            a player in values
+        """
+        cells = []
+        changes = {}
+        for player_id, value in values.iteritems():
+            entry = self.entries.get(player_id)
+            if entry is None:
+                continue
+            col, row, player = entry
+            team_key = self.teams[col].team_key
+            changes.setdefault(team_key, False)
+            if value != getattr(player, attr):
+                setattr(player, attr, value)
+                cells.append((row, col))
+                changes[team_key] = True
+        if fill_missing:
+            for player_id, (col, row, player) in self.entries.iteritems():
+                if player_id not in values and getattr(player, attr) != fill:
+                    setattr(player, attr, fill)
+                    cells.append((row, col))
+        return cells, changes
+
+    def moved(self, rosters):
+        """Return the team_keys whose roster differs from the indexed team,
+        because players were added, dropped or moved between slots
+
+        Parameters
+        ----------
+        rosters: dict
+            The dict of team_key and the list of its player_ids in roster order
+
+        Returns
+        -------
+        list[str]
+        """
+        moved = []
+        for team in self.teams:
+            roster = rosters.get(team.team_key)
+            if roster is not None and roster != [p.player_id
+                                                 for p in team.players]:
+                moved.append(team.team_key)
+        return moved
+
 def df_from_teams(teams, attr, with_initial=True):
+    import pandas as pd
+
     data = {}
     if with_initial and attr not in ['initial', 'full_name']:
         fn = lambda x: '%s %s' % (x.initial, getattr(x, attr))
@@ -80,4 +244,4 @@ def df_from_teams(teams, attr, with_initial=True):
     for team in teams:
         data[team.name] = map(fn, team.players)
     df = pd.DataFrame(data)
-    return df
\ No newline at end of file
+    return df
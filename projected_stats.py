@@ -1,37 +1,115 @@
-import mechanize
-import cookielib
-from BeautifulSoup import BeautifulSoup
+import threading
 
-from data.config import get_league_number, get_yahoo_username
+from cache import get_cache, content_hash, TTLS
+from data.config import get_league_key, get_yahoo_username, get_max_workers
+from fetch import fetch_all
+from ratelimit import limited, retry_after, account
+import instrument
 
+# Where Yahoo sends a session whose login has expired
+LOGIN_HOST = 'login.yahoo.com'
 
-def get_proj_points(x):
-    fn = x.find('td', attrs={'class': "Alt Ta-end Nowrap Bdrstart"})
-    id = x.find('a', attrs={'data-ys-playernote-view': 'notes'})
-    if fn is None:
-        fn = x.find('td', attrs={'class': "Ta-end Nowrap Bdrstart"})
-    fn = float(fn.find('div').text)
+
+class LoginRequired(Exception):
+    """Raised when a team page asks to log in again"""
+
+def get_proj_points(row):
+    fn = row.xpath('td[@class="Alt Ta-end Nowrap Bdrstart"]/div/text()')
+    if not fn:
+        fn = row.xpath('td[@class="Ta-end Nowrap Bdrstart"]/div/text()')
+    id = row.xpath('.//a[@data-ys-playernote-view="notes"]/@data-ys-playerid')
     try:
-        id = id.attrMap['data-ys-playerid']
-    except:
-        print 'test'
+        fn = float(fn[0])
+    except (IndexError, ValueError):
+        fn = None
+    id = id[0] if id else None
     return id, fn
 
-def get_points(br, url):
-    br.open(url)
-    page = br.response().read()
-    soup = BeautifulSoup(page)
+def parse_points(page):
+    """Parse the projected points of every player from a team page
+
+    Parameters
+    ----------
+    page: str
+        The html of the team page
+
+    Returns
+    -------
+    list[tuple(str, float)]
+        The player_id and projected points of each player on the page
+    """
+    from lxml import html
+
+    root = html.fromstring(page)
     rows = []
     for n in xrange(3):
-        table = soup.find('div', attrs={'id': 'statTable%s-wrap' % n})
-        table = table.find('table')
-        rows += table.findAll('tr')[2:]
-    points = map(get_proj_points, rows)
+        table = root.xpath('//div[@id="statTable%s-wrap"]//table' % n)[0]
+        rows += list(table.iter('tr'))[2:]
+    points = [get_proj_points(row) for row in rows]
+    return [(id, fn) for id, fn in points if id is not None and fn is not None]
+
+def get_points(session, url, cache=None, key=None):
+    """Fetch a team page and parse its projected points.  If cache remembers
+    an earlier response for key the request is made conditional on its ETag
+    and Last-Modified, and a 304 or an identical body reuses its points
+    without parsing the page
+
+    Parameters
+    ----------
+    session: requests.Session
+        The logged in session
+    url: str
+        The url of the team page
+    cache: cache.QueryCache
+        The cache remembering earlier responses.  Defaults to None
+    key: str
+        The key of the page in cache.  Defaults to None
+
+    Returns
+    -------
+    list[tuple(str, float)]
+        The player_id and projected points of each player on the page
+    """
+    previous = cache.recall(key) if cache is not None else None
+    headers = {}
+    if previous is not None:
+        validators = previous[2]
+        if 'etag' in validators:
+            headers['If-None-Match'] = validators['etag']
+        if 'last-modified' in validators:
+            headers['If-Modified-Since'] = validators['last-modified']
+    def request():
+        response = session.get(url, headers=headers)
+        retry_after(response.status_code, response.headers)
+        return response
+    with instrument.span('fetch_page') as span:
+        response = limited(request)
+        if (response.status_code in (401, 403) or
+                LOGIN_HOST in (getattr(response, 'url', None) or '')):
+            raise LoginRequired(url)
+        if previous is not None and response.status_code == 304:
+            span.add(hits=True)
+            return previous[1]
+        response.raise_for_status()
+        span.add(bytes=len(response.content))
+    digest = content_hash(response.content)
+    if previous is not None and previous[0] == digest:
+        return previous[1]
+    with instrument.span('parse_page') as span:
+        points = parse_points(response.content)
+        span.add(objects=len(points))
+    if cache is not None:
+        validators = dict((k, response.headers[k])
+                          for k in ('etag', 'last-modified')
+                          if k in response.headers)
+        cache.remember(key, digest, points, validators)
     return points
 
 def initialise_browser(url):
     import keyring
     import getpass
+    import cookielib
+    import mechanize
 
     br = mechanize.Browser()
     cj = cookielib.LWPCookieJar()
@@ -56,23 +134,157 @@ def initialise_browser(url):
     br.form['username'] = yahoo_username
     br.form['passwd'] = password
     br.submit()
-    return br
+    return br, cj
+
+def initialise_session(url, pool_size=12):
+    """Log in with initialise_browser and return a requests.Session sharing its
+    cookies with a connection pool large enough for pool_size concurrent
+    page loads
+
+    Parameters
+    ----------
+    url: str
+        The url of a page requiring login
+    pool_size: int
+        The number of pooled connections.  Defaults to 12
 
-def get_all_points():
-    league_num = get_league_number()
+    Returns
+    -------
+    requests.Session
+    """
+    import requests
+
+    _, cj = initialise_browser(url)
+    session = requests.Session()
+    session.cookies = cj
+    session.headers['User-agent'] = 'Chrome'
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                            pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session(url, pool_size=12, refresh=False):
+    """Return the logged in session shared by every scrape in this process,
+    logging in with initialise_session on first use or when refresh is True,
+    so the mechanize login and password prompt happen once rather than on
+    every cache miss
+
+    Parameters
+    ----------
+    url: str
+        The url of a page requiring login
+    pool_size: int
+        The number of pooled connections, at least config.get_max_workers().
+        Defaults to 12
+    refresh: bool
+        If True log in again, e.g. after LoginRequired.  Defaults to False
+
+    Returns
+    -------
+    requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None or refresh:
+            _session = initialise_session(url, max(pool_size,
+                                                   get_max_workers()))
+        return _session
+
+def get_all_points(week=None, num_teams=None, max_workers=None,
+                   force_refresh=False, closed=False, backend=None,
+                   league_key=None):
+    """Scrape the projected points of every rostered player in the league.
+    Team pages are fetched concurrently over one logged in session and the
+    points for each (team, week) are cached.  The login is skipped when every
+    team is served from the cache
+
+    Parameters
+    ----------
+    week: int
+        The week to scrape, if None the current week.  Defaults to None
+    num_teams: int
+        The number of teams in the league.  If None it is read from the league
+        settings through backend.  Defaults to None
+    max_workers: int
+        The number of pages to fetch concurrently.  If None the value from the
+        config file is used.  Defaults to None
+    force_refresh: bool
+        If True the cache is bypassed.  Defaults to False
+    closed: bool
+        If True the week has finished and its points are cached forever.
+        Defaults to False
+    backend: backends.Backend
+        The backend supplying the session used to fetch pages and, when
+        num_teams is None, the league settings.  If None a YQLBackend is used,
+        sharing the session of get_session.  A session asking to log in again
+        is replaced once.  Defaults to None
+    league_key: str
+        The league_key in the form XXX.l.XXXX, also the cache namespace.  If
+        None the league_key from the config file is used.  Defaults to None
+
+    Returns
+    -------
+    dict
+        The dict of player_id and projected points
+    """
+    if league_key is None:
+        league_key = get_league_key()
+    if num_teams is None:
+        from backends import YQLBackend
+        from yahoo_tools import get_num_teams
+
+        if backend is None:
+            backend = YQLBackend()
+        num_teams = get_num_teams(backend, backend.get_token(), league_key)
+    league_num = league_key.split('.l.')[1]
     url = 'http://football.fantasysports.yahoo.com/f1/{!s}'.format(league_num)
     url += '/%s?stat1=P&ssort=W'
-    br = initialise_browser(url % 1)
+    if week is not None:
+        url += '&week=%s' % week
+    cache = get_cache(league_key)
+    keys = dict((team_num, cache.key(url % team_num, league_key, week))
+                for team_num in xrange(1, num_teams + 1))
+    team_points = {}
+    if not force_refresh:
+        for team_num, key in keys.iteritems():
+            points = cache.get(key)
+            if points is not None:
+                team_points[team_num] = points
+    missing = [n for n in keys if n not in team_points]
+    if missing:
+        with instrument.span('get_all_points', pages=len(missing)):
+            ttl = TTLS['closed' if closed else 'projections']
+
+            def scrape(refresh):
+                with instrument.span('login'):
+                    if backend is None:
+                        session = get_session(url % 1, len(missing), refresh)
+                    else:
+                        session = backend.get_session(url % 1, len(missing),
+                                                      refresh)
+
+                def fetch(team_num):
+                    points = get_points(session, url % team_num, cache,
+                                        keys[team_num])
+                    cache.set(keys[team_num], points, ttl)
+                    return points
+                with account(league_key):
+                    return fetch_all(fetch, missing, max_workers,
+                                     fatal=(LoginRequired,))
+            try:
+                points = scrape(False)
+            except LoginRequired:
+                points = scrape(True)
+            team_points.update(zip(missing, points))
     all_points = {}
-    for team_num in xrange(1, 13):
-        points = get_points(br, url % team_num)
+    for points in team_points.itervalues():
         for k, v in points:
             all_points[k] = v
     return all_points
 
 if __name__ == '__main__':
-    league_num = get_league_number()
-    url = 'http://football.fantasysports.yahoo.com/f1/%s' % league_num
-    br = initialise_browser(url)
-    points = get_all_points()
-    print points
+    print get_all_points()
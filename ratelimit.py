@@ -0,0 +1,346 @@
+import time
+import threading
+
+from data import config
+
+# Request priorities, lower values are served first
+LIVE, NORMAL, BACKGROUND = 0, 1, 2
+# The share of the bucket each priority must leave for higher priorities
+RESERVE = {LIVE: 0., NORMAL: .25, BACKGROUND: .5}
+# Status codes Yahoo answers with when a client is sending too many requests
+THROTTLE_STATUS = (429, 999)
+
+
+class Throttled(Exception):
+    """Raised when Yahoo asks for requests to slow down
+
+    Parameters
+    ----------
+    delay: float
+        The number of seconds to wait from Retry-After, or None
+    """
+    def __init__(self, delay=None):
+        super(Throttled, self).__init__('Throttled, retry after %s' % delay)
+        self.delay = delay
+
+class BudgetExhausted(Exception):
+    """Raised for a request below LIVE priority once the period's request
+    budget is spent, rather than holding its thread until the next period
+
+    Parameters
+    ----------
+    reset: float
+        The number of seconds until the budget resets
+    """
+    def __init__(self, reset):
+        super(BudgetExhausted, self).__init__(
+            'Request budget spent, resets in %.0f seconds' % reset)
+        self.reset = reset
+
+def retry_after(status, headers):
+    """Raise Throttled if status is a throttling response, with the delay
+    from its Retry-After header if it has one
+
+    Parameters
+    ----------
+    status: int
+        The http status code of the response
+    headers: dict
+        The response headers
+    """
+    if status not in THROTTLE_STATUS:
+        return
+    headers = dict((k.lower(), v) for k, v in (headers or {}).items())
+    try:
+        delay = float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        delay = None
+    raise Throttled(delay)
+
+_local = threading.local()
+
+def current_priority():
+    """Return the priority of requests made by this thread"""
+    return getattr(_local, 'priority', NORMAL)
+
+def current_account():
+    """Return the name, typically a league_key, the requests of this thread
+    are charged to, or None
+    """
+    return getattr(_local, 'account', None)
+
+class priority(object):
+    """Context manager making the requests of this thread, and of the
+    functions wrapped by inherit within it, run at level
+
+        with priority(LIVE):
+            get_all_player_points(...)
+    """
+    def __init__(self, level):
+        self.level = level
+
+    def __enter__(self):
+        self.previous = current_priority()
+        _local.priority = self.level
+
+    def __exit__(self, *args):
+        _local.priority = self.previous
+
+class account(object):
+    """Context manager charging the requests of this thread, and of the
+    functions wrapped by inherit within it, to name's share of the budget
+
+        with account(league_key):
+            execute(...)
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.previous = current_account()
+        _local.account = self.name
+
+    def __exit__(self, *args):
+        _local.account = self.previous
+
+def inherit(fn):
+    """Wrap fn so it runs at the priority and is charged to the account of the
+    calling thread, for passing to worker threads
+    """
+    level = current_priority()
+    name = current_account()
+
+    def wrapped(*args, **kwargs):
+        with priority(level):
+            with account(name):
+                return fn(*args, **kwargs)
+    return wrapped
+
+class RateLimiter(object):
+    """Token bucket shared by every request made to Yahoo.  Tokens refill at
+    rate per second up to burst, and each priority may only take a token while
+    RESERVE of the bucket is left for higher priorities, so live refreshes are
+    served ahead of backfills.  A Throttled response empties the bucket and
+    blocks every request until its Retry-After has passed.  Once budget
+    requests have been made in a period only LIVE requests are served until
+    the next period, other requests raise BudgetExhausted.
+
+    The budget is split evenly between the registered accounts, typically
+    league_keys, and every request is charged to the account it is made in,
+    so schedulers can ask allow whether a league still has the requests a
+    refresh needs
+
+    Parameters
+    ----------
+    rate: float
+        The number of requests per second
+    burst: int
+        The size of the bucket, at least 1.  Every priority may always take
+        the last token of a full bucket so a small burst cannot starve the
+        lower priorities
+    budget: int
+        The number of requests allowed per period or None for no limit.
+        Defaults to None
+    period: float
+        The length of the budget period in seconds.  Defaults to 3600
+    backoff: float
+        The seconds to wait after a Throttled response without a Retry-After,
+        doubled for each consecutive one.  Defaults to 15
+    """
+    def __init__(self, rate, burst, budget=None, period=3600., backoff=15.):
+        if burst < 1:
+            raise ValueError('burst must be at least 1, not %s' % burst)
+        self.rate = float(rate)
+        self.burst = burst
+        self.budget = budget
+        self.period = period
+        self.backoff = backoff
+        self.tokens = float(burst)
+        self.updated = self.start = time.time()
+        self.blocked_until = 0.
+        self.strikes = 0
+        self.used = 0
+        self.accounts = {}
+        self.counts = {'requests': 0, 'waits': 0, 'wait_time': 0.,
+                       'throttled': 0}
+        self._cond = threading.Condition()
+
+    def _update(self, now):
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now - self.start >= self.period:
+            self.start = now
+            self.used = 0
+            for name in self.accounts:
+                self.accounts[name] = 0
+
+    def acquire(self, level=None):
+        """Wait until a request at level may be made and take its token
+
+        Parameters
+        ----------
+        level: int
+            LIVE, NORMAL or BACKGROUND.  Defaults to current_priority()
+
+        Raises
+        ------
+        BudgetExhausted
+            If level is not LIVE and the budget of this period is spent
+        """
+        if level is None:
+            level = current_priority()
+        floor = min(RESERVE[level] * self.burst, self.burst - 1)
+        started = time.time()
+        waited = False
+        with self._cond:
+            while True:
+                now = time.time()
+                self._update(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if (self.budget is not None and self.used >= self.budget
+                            and level != LIVE):
+                        raise BudgetExhausted(self.start + self.period - now)
+                    elif self.tokens - 1 >= floor:
+                        self.tokens -= 1
+                        self.used += 1
+                        name = current_account()
+                        if name in self.accounts:
+                            self.accounts[name] += 1
+                        self.counts['requests'] += 1
+                        if waited:
+                            self.counts['waits'] += 1
+                            self.counts['wait_time'] += now - started
+                        return
+                    else:
+                        wait = (floor + 1 - self.tokens) / self.rate
+                waited = True
+                self._cond.wait(wait)
+
+    def register(self, name):
+        """Add name, typically a league_key, to the accounts sharing the
+        budget
+        """
+        with self._cond:
+            self.accounts.setdefault(name, 0)
+
+    def share(self):
+        """Return the requests per period of each registered account"""
+        return float(self.budget) / max(len(self.accounts), 1)
+
+    def allow(self, name, cost=1):
+        """Return True if name has cost requests left of its share of the
+        budget in this period.  Nothing is charged, the requests are charged
+        as they are made
+
+        Parameters
+        ----------
+        name: str
+            The registered name
+        cost: int
+            The number of requests about to be made.  Defaults to 1
+        """
+        if self.budget is None:
+            return True
+        with self._cond:
+            self._update(time.time())
+            return (self.accounts.get(name, 0) + cost <= self.share() and
+                    self.used + cost <= self.budget)
+
+    def throttled(self, delay=None):
+        """Block every request for delay seconds after a Throttled response"""
+        with self._cond:
+            if delay is None:
+                delay = self.backoff * 2 ** min(self.strikes, 6)
+            self.strikes += 1
+            self.counts['throttled'] += 1
+            self.tokens = 0.
+            self.blocked_until = max(self.blocked_until, time.time() + delay)
+            self._cond.notify_all()
+
+    def succeeded(self):
+        """Reset the backoff after a request that was not throttled"""
+        self.strikes = 0
+
+    def counters(self):
+        """Return the requests made, waits, time spent waiting in seconds,
+        throttled responses, requests used in this period, remaining, and the
+        requests used by each account in this period
+        """
+        with self._cond:
+            self._update(time.time())
+            counts = dict(self.counts, used=self.used,
+                          accounts=dict(self.accounts))
+            counts['remaining'] = (None if self.budget is None
+                                   else max(self.budget - self.used, 0))
+            return counts
+
+    def call(self, fn, retries=3):
+        """Call fn once a token is available, retrying after the backoff when
+        it raises Throttled
+
+        Parameters
+        ----------
+        fn: function
+            The function making one request
+        retries: int
+            The number of retries after Throttled responses.  Defaults to 3
+        """
+        for attempt in range(retries + 1):
+            self.acquire()
+            try:
+                result = fn()
+            except Throttled as e:
+                self.throttled(e.delay)
+                if attempt == retries:
+                    raise
+            else:
+                self.succeeded()
+                return result
+
+_limiter = None
+_configured = False
+_limiter_lock = threading.Lock()
+
+def get_limiter():
+    """Return the RateLimiter shared by every request, created from the
+    config file on first use, or None if rate limiting is turned off
+    """
+    global _limiter, _configured
+    with _limiter_lock:
+        if not _configured:
+            per_minute = config.get_requests_per_minute()
+            if per_minute > 0:
+                _limiter = RateLimiter(per_minute / 60.,
+                                       config.get_request_burst(),
+                                       config.get_request_budget())
+            _configured = True
+        return _limiter
+
+def set_limiter(limiter):
+    """Replace the shared RateLimiter, None turns rate limiting off"""
+    global _limiter, _configured
+    with _limiter_lock:
+        _limiter = limiter
+        _configured = True
+
+def register(name):
+    """Register name with the shared RateLimiter if there is one"""
+    limiter = get_limiter()
+    if limiter is not None:
+        limiter.register(name)
+
+def allow(name, cost=1):
+    """Return True if name may make cost more requests, always if rate
+    limiting is turned off
+    """
+    limiter = get_limiter()
+    return limiter is None or limiter.allow(name, cost)
+
+def limited(fn, retries=3):
+    """Call fn through the shared RateLimiter if there is one"""
+    limiter = get_limiter()
+    if limiter is None:
+        return fn()
+    return limiter.call(fn, retries)
@@ -0,0 +1,234 @@
+import datetime
+
+from yahoo_tools import get_week, week_start
+
+
+# (weekday, start hour, end hour) of the NFL game slates in US Eastern time,
+# weekday as in datetime.weekday()
+GAME_WINDOWS = [(3, 20, 24),   # Thursday night
+                (6, 9, 24),    # Sunday, London games to Sunday night
+                (0, 0, 1),     # Sunday night games running past midnight
+                (0, 20, 24)]   # Monday night
+
+
+def nth_sunday(year, month, n):
+    """Return the date of the nth Sunday of month
+
+    >>> nth_sunday(2015, 3, 2)
+    datetime.date(2015, 3, 8)
+    """
+    first = datetime.date(year, month, 1)
+    return first + datetime.timedelta((6 - first.weekday()) % 7 + 7 * (n - 1))
+
+def eastern_time(utc=None):
+    """Return utc as US Eastern time, the time zone of GAME_WINDOWS, whatever
+    the time zone of the machine.  Daylight saving runs from 2am on the second
+    Sunday of March to 2am on the first Sunday of November
+
+    Parameters
+    ----------
+    utc: datetime.datetime
+        A naive UTC time.  Defaults to datetime.datetime.utcnow()
+
+    Returns
+    -------
+    datetime.datetime
+        The naive Eastern time
+
+    >>> eastern_time(datetime.datetime(2015, 9, 13, 17))
+    datetime.datetime(2015, 9, 13, 13, 0)
+    >>> eastern_time(datetime.datetime(2015, 12, 6, 18))
+    datetime.datetime(2015, 12, 6, 13, 0)
+    """
+    if utc is None:
+        utc = datetime.datetime.utcnow()
+    dst_start = datetime.datetime.combine(nth_sunday(utc.year, 3, 2),
+                                          datetime.time(7))
+    dst_end = datetime.datetime.combine(nth_sunday(utc.year, 11, 1),
+                                        datetime.time(6))
+    offset = -4 if dst_start <= utc < dst_end else -5
+    return utc + datetime.timedelta(hours=offset)
+
+def in_game_window(now=None, windows=GAME_WINDOWS, season=None):
+    """Return True if games may be live at now
+
+    Parameters
+    ----------
+    now: datetime.datetime
+        The US Eastern time to test.  Defaults to eastern_time()
+    windows: list[tuple(int, int, int)]
+        The (weekday, start hour, end hour) of each game window.  Defaults to
+        GAME_WINDOWS
+    season: tuple(datetime.date, datetime.date)
+        The first and last day of the season, as in get_league_settings.
+        Defaults to None, any date may have games
+
+    Returns
+    -------
+    bool
+
+    >>> in_game_window(datetime.datetime(2015, 9, 13, 14))
+    True
+    >>> in_game_window(datetime.datetime(2015, 9, 15, 9))
+    False
+    >>> season = (datetime.date(2016, 9, 8), datetime.date(2017, 1, 2))
+    >>> in_game_window(datetime.datetime(2016, 10, 2, 14), season=season)
+    True
+    >>> in_game_window(datetime.datetime(2017, 3, 5, 14), season=season)
+    False
+    """
+    if now is None:
+        now = eastern_time()
+    if season is not None and get_week(now.date(), season) is None:
+        return False
+    return any(now.weekday() == day and start <= now.hour < end
+               for day, start, end in windows)
+
+class RefreshSchedule(object):
+    """Decides how often to refresh a league's points and which teams to
+    refresh.  Outside game windows the league is polled at idle_interval.
+    During games the interval starts at base_interval and doubles after every
+    refresh in which nothing changed, up to max_interval.  Teams whose points
+    have not changed for settle_ticks refreshes are only rechecked every
+    recheck_ticks refreshes.
+
+    The scoreboard, passed to record_scoreboard whenever scoreboard_due says
+    so, refines this with the games of each team.  Teams with no games left
+    are not refreshed, live games keep the fast interval outside the game
+    windows, and once every team has finished the league idles until the
+    next week
+
+    Parameters
+    ----------
+    base_interval: int
+        The interval in milliseconds while points are changing
+    max_interval: int
+        The longest interval in milliseconds during game windows.  Defaults to
+        8 times base_interval
+    idle_interval: int
+        The interval in milliseconds outside game windows.  Defaults to 30
+        minutes
+    settle_ticks: int
+        The number of unchanged refreshes after which a team is skipped.
+        Defaults to 6
+    recheck_ticks: int
+        Every recheck_ticks refreshes all teams are refreshed.  Defaults to 10
+    season: tuple(datetime.date, datetime.date)
+        The first and last day of the season from get_league_settings,
+        outside of which the league idles.  Defaults to None, set later with
+        set_season
+    """
+    def __init__(self, base_interval, max_interval=None,
+                 idle_interval=30 * 60 * 1000, settle_ticks=6,
+                 recheck_ticks=10, season=None):
+        self.base_interval = base_interval
+        self.max_interval = max_interval or 8 * base_interval
+        self.idle_interval = idle_interval
+        self.settle_ticks = settle_ticks
+        self.recheck_ticks = recheck_ticks
+        self.idle_ticks = 0
+        self.ticks = 0
+        self.checks = 0
+        self.unchanged = {}
+        self.finished = set()
+        self.live = False
+        self.all_finished = False
+        self.scoreboard_week = None
+        self.season = season
+
+    def set_season(self, season):
+        """Set the first and last day of the season, e.g. once the league
+        settings have loaded
+        """
+        self.season = season
+
+    def interval(self, now=None):
+        """Return the number of milliseconds until the next refresh
+
+        Parameters
+        ----------
+        now: datetime.datetime
+            The current time.  Defaults to datetime.datetime.now()
+
+        Returns
+        -------
+        int
+        """
+        self._expire()
+        if self.all_finished or not (
+                self.live or in_game_window(now, season=self.season)):
+            return self.idle_interval
+        interval = self.base_interval * 2 ** min(self.idle_ticks, 16)
+        return min(interval, self.max_interval)
+
+    def teams_due(self, team_keys):
+        """Return the team_keys to refresh on this tick
+
+        Parameters
+        ----------
+        team_keys: list[str]
+            Every team_key in the league
+
+        Returns
+        -------
+        list[str]
+            The team_keys that are not settled, or all of them on a recheck,
+            leaving out the teams with no games left
+        """
+        self._expire()
+        self.ticks += 1
+        team_keys = [key for key in team_keys if key not in self.finished]
+        if self.ticks % self.recheck_ticks == 0:
+            return team_keys
+        return [key for key in team_keys
+                if self.unchanged.get(key, 0) < self.settle_ticks]
+
+    def scoreboard_due(self):
+        """Return True if this refresh should fetch the scoreboard for
+        record_scoreboard, on the first refresh of each week and every
+        recheck_ticks refreshes after
+        """
+        self._expire()
+        due = self.checks % self.recheck_ticks == 0
+        self.checks += 1
+        return due
+
+    def record_scoreboard(self, matchups):
+        """Record the games of each team from the scoreboard
+
+        Parameters
+        ----------
+        matchups: list
+            The matchups as returned by get_matchup_points.  Teams without
+            remaining_games and live_games are treated as still playing
+        """
+        teams = [team for matchup in matchups for team in matchup]
+        self.finished = set(team['team_key'] for team in teams
+                            if team.get('remaining_games') == 0 and
+                            team.get('live_games') == 0)
+        self.live = any(team.get('live_games') for team in teams)
+        self.all_finished = bool(teams) and len(self.finished) == len(teams)
+        self.scoreboard_week = week_start()
+
+    def _expire(self):
+        # The scoreboard of a past week says nothing about the current one
+        if self.scoreboard_week is not None and (
+                self.scoreboard_week != week_start()):
+            self.finished = set()
+            self.live = self.all_finished = False
+            self.scoreboard_week = None
+            self.checks = 0
+
+    def record(self, changes):
+        """Record the outcome of a refresh
+
+        Parameters
+        ----------
+        changes: dict
+            The dict mapping each refreshed team_key to True if any of its
+            players' points changed
+        """
+        for team_key, changed in changes.iteritems():
+            self.unchanged[team_key] = (
+                0 if changed else self.unchanged.get(team_key, 0) + 1)
+        self.idle_ticks = 0 if any(changes.values()) else self.idle_ticks + 1
@@ -0,0 +1,95 @@
+"""Live scoreboard that polls the single league scoreboard query and only
+pulls rosters for the matchups whose score changed.
+
+    python scoreboard.py --interval 10
+"""
+import time
+import argparse
+
+from ratelimit import priority, LIVE
+from yahoo_tools import get_matchup_points, get_all_player_points
+
+
+class ScoreboardMonitor(object):
+    """Polls fantasysports.leagues.scoreboard, one request per tick, and
+    fetches player points only for the teams in matchups whose score changed
+    since the previous tick
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The connection to use for queries
+    token: yql.YahooToken
+        The token used to secure y3
+    league_key: str
+        The league_key in the form XXX.l.XXXX
+    """
+    def __init__(self, y3, token, league_key):
+        self.y3 = y3
+        self.token = token
+        self.league_key = league_key
+        self.points = {}
+
+    def tick(self, get_players=True, rosters=None):
+        """Fetch the scoreboard and the player points of changed matchups
+
+        Parameters
+        ----------
+        get_players: bool
+            If False the rosters of changed matchups are not fetched.  Defaults
+            to True
+        rosters: dict
+            Passed through to get_all_player_points.  Defaults to None
+
+        Returns
+        -------
+        tuple(list, list, dict)
+            The matchups as returned by get_matchup_points, the team_keys in
+            matchups whose score changed, and the dict of player_id and
+            player_points for those teams
+        """
+        with priority(LIVE):
+            matchups = get_matchup_points(self.y3, self.token,
+                                          self.league_key, force_refresh=True)
+        changed = []
+        for matchup in matchups:
+            if any(self.points.get(t['team_key']) != t['points']
+                   for t in matchup):
+                changed += [t['team_key'] for t in matchup]
+            for team in matchup:
+                self.points[team['team_key']] = team['points']
+        player_points = {}
+        if changed and get_players:
+            with priority(LIVE):
+                player_points = get_all_player_points(
+                    self.y3, self.token, self.league_key, team_keys=changed,
+                    force_refresh=True, rosters=rosters)
+        return matchups, changed, player_points
+
+def format_matchup(matchup):
+    return '  vs  '.join('%s %.2f (%.2f)' % (t['name'], t['points'],
+                                            t['projected_points'])
+                         for t in matchup)
+
+def main():
+    from backends import YQLBackend
+    from data import config
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--interval', type=float, default=10.,
+                        help='seconds between scoreboard refreshes')
+    parser.add_argument('--league', help='league_key, defaults to the config')
+    args = parser.parse_args()
+    backend = YQLBackend()
+    league_key = args.league or config.get_league_key()
+    monitor = ScoreboardMonitor(backend, backend.get_token(), league_key)
+    while True:
+        matchups, changed, _ = monitor.tick(get_players=False)
+        if changed:
+            print time.strftime('%H:%M:%S')
+            for matchup in matchups:
+                print format_matchup(matchup)
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
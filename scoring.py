@@ -0,0 +1,120 @@
+import numpy as np
+
+
+def modifier_vector(stat_index, modifiers):
+    """Return the scoring modifiers as a vector ordered by stat_index
+
+    Parameters
+    ----------
+    stat_index: StatIndex
+        The order of the stats in each player's stat array
+    modifiers: dict
+        The dict mapping stat_id to the points per unit of the stat, as
+        returned by yahoo_tools.get_stat_modifiers.  Stats without a modifier
+        score nothing
+
+    Returns
+    -------
+    numpy.ndarray
+        Float array of length len(stat_index)
+    """
+    return np.array([modifiers.get(s, 0.) for s in stat_index.stat_ids])
+
+class LeagueStats(object):
+    """The stats of every player in a week held as a single players x stat_ids
+    matrix so that the whole league can be scored with one dot product
+
+    Parameters
+    ----------
+    teams: list[Team]
+        The teams to score.  Every player must share the same StatIndex
+    """
+    def __init__(self, teams):
+        self.teams = teams
+        self.players = [player for team in teams for player in team.players]
+        self.stat_index = self.players[0].stat_index if self.players else None
+        self.team_index = np.repeat(np.arange(len(teams)),
+                                    [len(team.players) for team in teams])
+        self.played = np.array([player.selected_position != 'BN'
+                                for player in self.players], bool)
+        if self.players:
+            matrix = np.vstack([np.frombuffer(player.stats)
+                                for player in self.players])
+        else:
+            matrix = np.zeros((0, 0))
+        self.matrix = np.nan_to_num(matrix)
+
+    def player_points(self, modifiers):
+        """Return the fantasy points of every player
+
+        Parameters
+        ----------
+        modifiers: dict, numpy.ndarray
+            Either the dict of stat_id to modifier or a vector already ordered
+            by stat_index.  Use a different dict to try out other scoring rules
+
+        Returns
+        -------
+        numpy.ndarray
+            The points of each player in the order of self.players
+        """
+        if isinstance(modifiers, dict):
+            modifiers = modifier_vector(self.stat_index, modifiers)
+        if not self.players:
+            return np.zeros(0)
+        return self.matrix.dot(modifiers)
+
+    def team_points(self, modifiers, starters_only=True):
+        """Return the fantasy points of every team
+
+        Parameters
+        ----------
+        modifiers: dict, numpy.ndarray
+            Either the dict of stat_id to modifier or a vector already ordered
+            by stat_index
+        starters_only: bool
+            If True bench players are not counted.  Defaults to True
+
+        Returns
+        -------
+        numpy.ndarray
+            The points of each team in the order of self.teams
+        """
+        points = self.player_points(modifiers)
+        if starters_only:
+            points = points * self.played
+        return np.bincount(self.team_index, weights=points,
+                           minlength=len(self.teams))
+
+    def apply(self, modifiers):
+        """Set player_points on every Player from the computed points
+
+        Parameters
+        ----------
+        modifiers: dict, numpy.ndarray
+            Either the dict of stat_id to modifier or a vector already ordered
+            by stat_index
+        """
+        for player, points in zip(self.players, self.player_points(modifiers)):
+            player.set_player_points(float(points))
+
+def season_team_points(weeks, modifiers, starters_only=True):
+    """Return the fantasy points of every team summed over several weeks
+
+    Parameters
+    ----------
+    weeks: list[list[Team]]
+        The teams loaded for each week, in the same team order every week
+    modifiers: dict
+        The dict mapping stat_id to modifier
+    starters_only: bool
+        If True bench players are not counted.  Defaults to True
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (weeks, teams) of the points of each team in each week.
+        Sum over axis 0 for season totals
+    """
+    return np.array([LeagueStats(teams).team_points(modifiers, starters_only)
+                     for teams in weeks])
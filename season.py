@@ -0,0 +1,208 @@
+import os
+from array import array
+
+import numpy as np
+
+from data import config
+from fetch import fetch_all
+from ratelimit import priority, BACKGROUND
+from backends import Backend, YQLBackend
+from player import Player, Team, StatIndex, PlayerIndex
+from projected_stats import get_all_points
+from yahoo_tools import (week_dates, get_week, is_closed_week, get_stat_index,
+                         get_num_teams, construct_teams_and_players)
+
+
+def season_directory(league_key):
+    """Return the directory the weekly files for league_key are stored in,
+    ~/YahooFF/season/<league_key>, creating it if needed
+    """
+    directory = os.path.expanduser(os.path.join('~/YahooFF/season', league_key))
+    config.mkdir_p(directory)
+    return directory
+
+def week_path(league_key, week):
+    return os.path.join(season_directory(league_key), 'week_%02d.npz' % week)
+
+def save_week(path, teams):
+    """Save teams to path as a compressed .npz of one array per player field
+
+    Parameters
+    ----------
+    path: str
+        The file to write
+    teams: list[Team]
+        The teams to save.  Every player must share the same StatIndex
+    """
+    players = [player for team in teams for player in team.players]
+    stat_index = players[0].stat_index if players else StatIndex([])
+
+    def field(attr, dtype=unicode):
+        return np.array([dtype(getattr(p, attr) or '') for p in players])
+
+    def number(attr):
+        return np.array([np.nan if getattr(p, attr) is None
+                         else getattr(p, attr) for p in players], float)
+    if players:
+        stats = np.vstack([np.frombuffer(p.stats) for p in players])
+    else:
+        stats = np.zeros((0, len(stat_index)))
+    np.savez_compressed(
+        path,
+        team_keys=np.array([unicode(t.team_key) for t in teams]),
+        team_names=np.array([unicode(t.name) for t in teams]),
+        team_sizes=np.array([len(t.players) for t in teams], int),
+        stat_ids=np.array(stat_index.stat_ids, unicode),
+        player_id=field('player_id'), first_name=field('first_name'),
+        last_name=field('last_name'), full_name=field('full_name'),
+        position=field('position'),
+        selected_position=field('selected_position'),
+        bye_week=field('bye_week'), player_points=number('player_points'),
+        proj_points=number('proj_points'), stats=stats)
+
+def read_week(path):
+    """Read the teams saved by save_week
+
+    Parameters
+    ----------
+    path: str
+        The file to read
+
+    Returns
+    -------
+    list[Team]
+        The teams with their players
+    """
+    with np.load(path) as data:
+        stat_index = StatIndex(data['stat_ids'].tolist())
+        stats = data['stats']
+        text = dict((k, data[k].tolist()) for k in
+                    ['player_id', 'first_name', 'last_name', 'full_name',
+                     'position', 'selected_position', 'bye_week'])
+        points = data['player_points'].tolist()
+        proj_points = data['proj_points'].tolist()
+        team_fields = zip(data['team_keys'], data['team_names'],
+                          data['team_sizes'])
+    teams = []
+    start = 0
+    for team_key, name, size in team_fields:
+        players = []
+        for i in range(start, start + size):
+            player = Player(stat_index)
+            for attr, values in text.iteritems():
+                setattr(player, attr, values[i] or None)
+            player.player_points = points[i]
+            if proj_points[i] == proj_points[i]:
+                player.proj_points = proj_points[i]
+            player.stats = array('d', stats[i].tobytes())
+            players.append(player)
+        start += size
+        teams.append(Team(players, team_key=team_key, name=name))
+    return teams
+
+def read_season(league_key, weeks=None):
+    """Read the weeks of league_key already saved by load_season, without
+    making any requests
+
+    Parameters
+    ----------
+    league_key: str
+        The league_key in the form XXX.l.XXXX
+    weeks: list[int]
+        The weeks to read.  If None every saved week is read.  Weeks that are
+        not on disk are left out.  Defaults to None
+
+    Returns
+    -------
+    dict
+        The dict mapping week to its list of Team objects
+    """
+    if weeks is None:
+        weeks = [int(name[5:7]) for name in os.listdir(
+            season_directory(league_key))
+                 if name.startswith('week_') and name.endswith('.npz')]
+    return dict((week, read_week(week_path(league_key, week)))
+                for week in weeks
+                if os.path.exists(week_path(league_key, week)))
+
+def has_projections(teams):
+    """Return True if any player of teams has projected points"""
+    return any(player.proj_points is not None
+               for team in teams for player in team.players)
+
+def load_season(y3, token, league_key, weeks=None, max_workers=4):
+    """Fetch every week of the season that is missing from disk or may still
+    change, with the projected points of every player, store each one with
+    save_week and return all of them.  Completed weeks already on disk are
+    read back instead of being refetched, unless they were saved without
+    projections.  The queries run at BACKGROUND priority so they never delay
+    live refreshes
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged, backends.Backend
+        The connection to use to query teams and player data.  A Backend also
+        supplies the session used to scrape the projected points
+    token: yql.YahooToken
+        Token to use to secure y3
+    league_key: str
+        The league_key in the form XXX.l.XXXX
+    weeks: list[int]
+        The weeks to load.  If None every week from 1 to the current week is
+        loaded.  Defaults to None
+    max_workers: int
+        The number of weeks to fetch concurrently.  Defaults to 4
+
+    Returns
+    -------
+    dict
+        The dict mapping week to its list of Team objects
+    """
+    if weeks is None:
+        current = get_week() or len(week_dates)
+        weeks = range(1, current + 1)
+    backend = y3 if isinstance(y3, Backend) else YQLBackend(y3)
+    season = {}
+    for week in weeks:
+        path = week_path(league_key, week)
+        if is_closed_week(week) and os.path.exists(path):
+            teams = read_week(path)
+            if has_projections(teams):
+                season[week] = teams
+    stale = [week for week in weeks if week not in season]
+    if not stale:
+        return season
+    stat_index = get_stat_index(backend, token, league_key)
+    num_teams = get_num_teams(backend, token, league_key)
+
+    def fetch(week):
+        teams = construct_teams_and_players(backend, token, league_key, week,
+                                            num_teams=num_teams,
+                                            stat_index=stat_index)
+        proj_points = get_all_points(week, num_teams,
+                                     closed=is_closed_week(week),
+                                     backend=backend, league_key=league_key)
+        PlayerIndex(teams).scatter('proj_points', proj_points)
+        save_week(week_path(league_key, week), teams)
+        return teams
+    with priority(BACKGROUND):
+        season.update(zip(stale, fetch_all(fetch, stale, max_workers)))
+    return season
+
+def main():
+    import argparse
+    from backends import YQLBackend
+
+    parser = argparse.ArgumentParser(
+        description='Save every week of the season to disk for the win '
+                    'probabilities of the monitor')
+    parser.add_argument('--league', help='league_key, defaults to the config')
+    args = parser.parse_args()
+    backend = YQLBackend()
+    league_key = args.league or config.get_league_key()
+    season = load_season(backend, backend.get_token(), league_key)
+    print 'Saved weeks %s to %s' % (sorted(season),
+                                    season_directory(league_key))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""Monte Carlo win probabilities.  Each starter's remaining points are sampled
+from the errors of projections at their position, taken from the season
+history when there is enough of it, and whole matchups are simulated at once
+as (simulations, starters) arrays.
+"""
+import numpy as np
+
+# Standard deviation of actual minus projected points by position, used when
+# the season history has too few players at a position
+DEFAULT_SPREAD = {'QB': 7., 'WR': 6.5, 'RB': 6.5, 'TE': 5., 'K': 4.,
+                  'DEF': 6.}
+DEFAULT_POSITION_SPREAD = 6.
+# The fewest projection errors needed to sample a position from history
+MIN_SAMPLES = 30
+
+
+def primary_position(player):
+    """Return the first of the player's display positions"""
+    return (player.position or '').split(',')[0].strip()
+
+def valid(value):
+    return value is not None and value == value
+
+class PositionModel(object):
+    """The distribution of actual minus projected points for each position
+
+    Parameters
+    ----------
+    errors: dict
+        The dict of position and the array of projection errors observed at
+        that position.  Positions with fewer than MIN_SAMPLES errors are
+        sampled from a normal with the DEFAULT_SPREAD of the position
+    """
+    def __init__(self, errors=None):
+        self.errors = dict((position, np.asarray(values, float))
+                           for position, values in (errors or {}).iteritems()
+                           if len(values) >= MIN_SAMPLES)
+
+    @classmethod
+    def from_season(cls, season):
+        """Build the model from the weeks returned by season.load_season,
+        using every player with both projected and actual points
+
+        Parameters
+        ----------
+        season: dict
+            The dict of week and the list of Team objects for that week
+        """
+        errors = {}
+        for teams in season.itervalues():
+            for team in teams:
+                for player in team.players:
+                    if valid(player.player_points) and valid(
+                            player.proj_points):
+                        errors.setdefault(primary_position(player), []).append(
+                            player.player_points - player.proj_points)
+        return cls(errors)
+
+    def sample(self, positions, n, rng):
+        """Return an (n, len(positions)) array of projection errors
+
+        Parameters
+        ----------
+        positions: list[str]
+            The position of each player
+        n: int
+            The number of simulations
+        rng: numpy.random.RandomState
+            The random number generator
+        """
+        noise = np.empty((n, len(positions)))
+        for position in set(positions):
+            cols = [i for i, p in enumerate(positions) if p == position]
+            errors = self.errors.get(position)
+            if errors is not None:
+                noise[:, cols] = rng.choice(errors, (n, len(cols)))
+            else:
+                spread = DEFAULT_SPREAD.get(position, DEFAULT_POSITION_SPREAD)
+                noise[:, cols] = rng.normal(0., spread, (n, len(cols)))
+        return noise
+
+def simulate_team(team, model, n, rng):
+    """Return an array of n simulated final scores of team.  Each starter
+    scores their current points plus the rest of their projection, with the
+    projection error scaled by the share of the projection still to come
+
+    Parameters
+    ----------
+    team: Team
+        The team, its starters' player_points and proj_points are used
+    model: PositionModel
+        The projection error of each position
+    n: int
+        The number of simulations
+    rng: numpy.random.RandomState
+        The random number generator
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    starters = team.played
+    current = np.array([p.player_points if valid(p.player_points) else 0.
+                        for p in starters])
+    projected = np.array([p.proj_points if valid(p.proj_points) else 0.
+                          for p in starters])
+    remaining = np.maximum(projected - current, 0.)
+    share = np.where(projected > 0, remaining / np.maximum(projected, 1e-9),
+                     0.)
+    noise = model.sample([primary_position(p) for p in starters], n, rng)
+    return current.sum() + (remaining + noise * share).sum(axis=1)
+
+def win_probability(team_a, team_b, model=None, n=20000, seed=None):
+    """Return the probability that team_a beats team_b, ties counting half
+
+    Parameters
+    ----------
+    team_a, team_b: Team
+        The teams in the matchup
+    model: PositionModel
+        The projection errors to sample from.  Defaults to a PositionModel
+        using DEFAULT_SPREAD
+    n: int
+        The number of simulations.  Defaults to 20000
+    seed: int
+        Seed for the random number generator.  Defaults to None
+
+    Returns
+    -------
+    float
+    """
+    model = model or PositionModel()
+    rng = np.random.RandomState(seed)
+    a = simulate_team(team_a, model, n, rng)
+    b = simulate_team(team_b, model, n, rng)
+    return float(np.mean(a > b) + 0.5 * np.mean(a == b))
+
+def matchup_odds(teams, matchups, model=None, n=20000, seed=None):
+    """Return the win probability of every team in matchups
+
+    Parameters
+    ----------
+    teams: list[Team]
+        The loaded teams of the league
+    matchups: list
+        The matchups as returned by get_matchup_points.  Matchups with a team
+        that is not in teams, or whose starters have no projected points to
+        simulate from, are skipped
+    model: PositionModel
+        Defaults to a PositionModel using DEFAULT_SPREAD
+    n: int
+        The number of simulations of each matchup.  Defaults to 20000
+    seed: int
+        Seed for the random number generator.  Defaults to None
+
+    Returns
+    -------
+    dict
+        The dict of team_key and probability of winning
+    """
+    by_key = dict((team.team_key, team) for team in teams)
+    odds = {}
+    for matchup in matchups:
+        keys = [t['team_key'] for t in matchup]
+        if len(keys) != 2 or not all(key in by_key for key in keys):
+            continue
+        if not any(valid(p.proj_points) for key in keys
+                   for p in by_key[key].played):
+            continue
+        p = win_probability(by_key[keys[0]], by_key[keys[1]], model, n, seed)
+        odds[keys[0]] = p
+        odds[keys[1]] = 1. - p
+    return odds
+
+def team_history(season):
+    """Return the points of the starters of every team in every week of
+    season as an array of shape (weeks, teams) in week order
+    """
+    return np.array([[np.nansum([p.player_points for p in team.played
+                                 if p.player_points is not None])
+                      for team in season[week]]
+                     for week in sorted(season)])
+
+def _simulate_season(args):
+    wins, points, means, spreads, schedule, playoff_teams, n, seed = args
+    rng = np.random.RandomState(seed)
+    num_teams = len(wins)
+    total_wins = np.tile(np.asarray(wins, float), (n, 1))
+    total_points = np.tile(np.asarray(points, float), (n, 1))
+    for week in schedule:
+        scores = rng.normal(means, spreads, (n, num_teams))
+        total_points += scores
+        for a, b in week:
+            a_wins = scores[:, a] > scores[:, b]
+            total_wins[:, a] += a_wins
+            total_wins[:, b] += ~a_wins
+    # Rank by wins then points, points are far below 1e6 per season
+    rank = np.argsort(-(total_wins * 1e6 + total_points), axis=1)
+    made = np.zeros(num_teams)
+    for team in xrange(num_teams):
+        made[team] = np.sum(rank[:, :playoff_teams] == team)
+    return made
+
+def playoff_odds(wins, points, history, schedule, playoff_teams=4, n=20000,
+                 seed=None, processes=None):
+    """Simulate the rest of the season and return each team's probability of
+    making the playoffs.  Weekly scores are drawn from a normal with the mean
+    and spread of each team's history
+
+    Parameters
+    ----------
+    wins: list[float]
+        The current wins of each team, in team order
+    points: list[float]
+        The current points for of each team, the tie breaker
+    history: numpy.ndarray
+        The weekly points of each team as returned by team_history
+    schedule: list[list[tuple(int, int)]]
+        The remaining weeks, each a list of matchups of team indices
+    playoff_teams: int
+        The number of teams making the playoffs.  Defaults to 4
+    n: int
+        The number of simulated seasons.  Defaults to 20000
+    seed: int
+        Seed for the random number generators.  Defaults to None
+    processes: int
+        If given the simulations are split across a process pool of this size.
+        Defaults to None, simulating in this process
+
+    Returns
+    -------
+    numpy.ndarray
+        The probability of each team making the playoffs
+    """
+    history = np.asarray(history, float)
+    means = history.mean(axis=0)
+    spreads = history.std(axis=0) if len(history) > 1 else np.full(
+        len(wins), 20.)
+    chunks = processes or 1
+    seeds = np.random.RandomState(seed).randint(0, 2 ** 31 - 1, chunks)
+    sizes = [n // chunks + (i < n % chunks) for i in xrange(chunks)]
+    jobs = [(wins, points, means, spreads, schedule, playoff_teams, size,
+             chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+    if processes:
+        from multiprocessing import Pool
+
+        pool = Pool(processes)
+        try:
+            made = pool.map(_simulate_season, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        made = map(_simulate_season, jobs)
+    return np.sum(made, axis=0) / float(n)
@@ -0,0 +1,266 @@
+import numpy as np
+from PySide import QtGui, QtCore
+
+
+def player_value(player, attr):
+    """Return the value of attr for player.  Stats are selected with an attr of
+    the form 'stat:<stat_id>'
+
+    Parameters
+    ----------
+    player: Player
+        The player to read from
+    attr: str
+        The player attribute or stat
+
+    Returns
+    -------
+    object
+        The value, None if the player has no such stat
+    """
+    if attr.startswith('stat:'):
+        return player.stat(attr[5:])
+    return getattr(player, attr)
+
+def cell_text(value):
+    """Return the text to display in a table cell for value
+
+    >>> cell_text(None)
+    u''
+    >>> cell_text(12.5)
+    u'12.5'
+    >>> cell_text(3.0)
+    u'3'
+    """
+    if value is None or value != value:
+        return u''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return unicode(value)
+
+class LeagueTableModel(QtCore.QAbstractTableModel):
+    """Table model with a row for each roster position and a column for each
+    team.  The values of each player attribute are held column by column in
+    arrays of shape (positions, teams) so that switching the displayed
+    attribute only swaps the array and emits a single dataChanged
+
+    Parameters
+    ----------
+    positions: list[str]
+        The roster position labels used for the vertical header
+    attr: str
+        The player attribute to display.  Defaults to 'initial'
+    """
+    def __init__(self, positions, attr='initial', parent=None):
+        super(LeagueTableModel, self).__init__(parent)
+        self.positions = positions
+        self.attr = attr
+        self.teams = []
+        self.columns = {}
+        self.highlighted = {}
+        self.notes = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return len(self.positions)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(self.teams)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        cell = index.row(), index.column()
+        if role == QtCore.Qt.DisplayRole:
+            return cell_text(self.column(self.attr)[cell])
+        if role == QtCore.Qt.BackgroundRole and cell in self.highlighted:
+            return QtGui.QColor(self.highlighted[cell])
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            team = self.teams[section]
+            note = self.notes.get(team.team_key)
+            return team.name if note is None else '%s\n%s' % (team.name, note)
+        return self.positions[section]
+
+    def column(self, attr):
+        """Return the array of attr for every player, building it on first use
+
+        Parameters
+        ----------
+        attr: str
+            The player attribute or stat
+
+        Returns
+        -------
+        numpy.ndarray
+            Object array of shape (positions, teams)
+        """
+        if attr not in self.columns:
+            values = np.empty((len(self.positions), len(self.teams)), object)
+            for col, team in enumerate(self.teams):
+                players = team.players[:len(self.positions)]
+                for row, player in enumerate(players):
+                    values[row, col] = player_value(player, attr)
+            self.columns[attr] = values
+        return self.columns[attr]
+
+    def set_positions(self, positions):
+        """Replace the roster position rows
+
+        Parameters
+        ----------
+        positions: list[str]
+            The roster position labels in roster order
+        """
+        self.beginResetModel()
+        self.positions = positions
+        self.columns = {}
+        self.highlighted = {}
+        self.endResetModel()
+
+    def clear(self):
+        """Remove every team from the model"""
+        self.beginResetModel()
+        self.teams = []
+        self.columns = {}
+        self.highlighted = {}
+        self.notes = {}
+        self.endResetModel()
+
+    def add_team(self, team):
+        """Append a column for team
+
+        Parameters
+        ----------
+        team: Team
+            The team to add
+        """
+        col = len(self.teams)
+        self.beginInsertColumns(QtCore.QModelIndex(), col, col)
+        self.teams.append(team)
+        self.columns = {}
+        self.endInsertColumns()
+
+    def replace_team(self, col, team):
+        """Replace the team in column col, e.g. after a roster move, and
+        re-read its cells
+
+        Parameters
+        ----------
+        col: int
+            The column of the team
+        team: Team
+            The reloaded team
+        """
+        self.teams[col] = team
+        for attr, values in self.columns.iteritems():
+            values[:, col] = None
+            for row, player in enumerate(team.players[:len(self.positions)]):
+                values[row, col] = player_value(player, attr)
+        self.headerDataChanged.emit(QtCore.Qt.Horizontal, col, col)
+        self.emit_changed(0, col, self.rowCount() - 1, col)
+
+    def set_notes(self, notes):
+        """Show a note below the name of each team in the header
+
+        Parameters
+        ----------
+        notes: dict
+            The dict of team_key and note text
+        """
+        self.notes = notes
+        if self.teams:
+            self.headerDataChanged.emit(QtCore.Qt.Horizontal, 0,
+                                        len(self.teams) - 1)
+
+    def set_attr(self, attr):
+        """Display attr for every player
+
+        Parameters
+        ----------
+        attr: str
+            The player attribute or stat to display
+        """
+        self.attr = attr
+        self.emit_changed(0, 0, self.rowCount() - 1, self.columnCount() - 1)
+
+    def refresh(self, attr, cells=None, highlight=True):
+        """Re-read attr from the players and notify the view of the cells whose
+        value changed
+
+        Parameters
+        ----------
+        attr: str
+            The player attribute or stat to refresh
+        cells: list[tuple(int, int)]
+            The (row, col) of the cells to re-read.  If None every cell is
+            compared.  Defaults to None
+        highlight: bool
+            If True the changed cells are highlighted for the default amount of
+            time.  Defaults to True
+        """
+        if attr not in self.columns:
+            return
+        values = self.columns[attr]
+        if cells is None:
+            self.columns.pop(attr)
+            new_values = self.column(attr)
+            rows, cols = np.nonzero(new_values != values)
+            cells = zip(rows, cols)
+        else:
+            cells = [(row, col) for row, col in cells
+                     if row < len(self.positions)]
+            for row, col in cells:
+                player = self.teams[col].players[row]
+                values[row, col] = player_value(player, attr)
+        if not cells or attr != self.attr:
+            return
+        if highlight:
+            self.highlight(cells)
+        else:
+            self.emit_cells_changed(cells)
+
+    def highlight(self, cells, timelimit=3000, color='red'):
+        """Highlight the background of cells in color.  After the timelimit the
+        highlight is removed
+
+        Parameters
+        ----------
+        cells: list[tuple(int, int)]
+            The (row, col) of each cell to highlight
+        timelimit: int
+            The time in milliseconds before the highlight is removed.  Defaults
+            to 3000
+        color: str
+            The color the cells are to be highlighted.  Must be acceptable by
+            QtGui.QColor().  Defaults to 'red'.
+        """
+        cells = list(cells)
+        for cell in cells:
+            self.highlighted[cell] = color
+        self.emit_cells_changed(cells)
+
+        def clear():
+            for cell in cells:
+                if self.highlighted.get(cell) == color:
+                    del self.highlighted[cell]
+            self.emit_cells_changed(cells)
+        QtCore.QTimer.singleShot(timelimit, clear)
+
+    def emit_cells_changed(self, cells):
+        """Emit a single dataChanged covering every cell in cells"""
+        if not cells:
+            return
+        rows, cols = zip(*cells)
+        self.emit_changed(min(rows), min(cols), max(rows), max(cols))
+
+    def emit_changed(self, top, left, bottom, right):
+        bottom = min(bottom, self.rowCount() - 1)
+        right = min(right, self.columnCount() - 1)
+        if bottom < top or right < left:
+            return
+        self.dataChanged.emit(self.index(top, left),
+                              self.index(bottom, right))
@@ -0,0 +1,107 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+import cache
+from cache import QueryCache, content_hash
+
+
+class FakeClock(object):
+    """Replaces the time module of cache so entries can be expired exactly"""
+    def __init__(self, now=1000.):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+class QueryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        cache.time = self.clock
+        self.directory = tempfile.mkdtemp()
+        self.cache = QueryCache(self.directory, max_bytes=1024 * 1024,
+                                memo_size=2)
+
+    def tearDown(self):
+        cache.time = time
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        key = QueryCache.key('SELECT *\n  FROM t', '1.l.1', 2)
+        self.assertEqual(key, QueryCache.key('SELECT * FROM t', '1.l.1', 2))
+        self.assertNotEqual(key, QueryCache.key('SELECT * FROM t', '1.l.1', 3))
+
+    def test_expiry(self):
+        self.cache.set('a', [1], 10)
+        self.assertEqual(self.cache.get('a'), [1])
+        self.clock.now += 10.
+        self.assertEqual(self.cache.get('a'), [1])
+        self.clock.now += 1.
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_never_expires(self):
+        self.cache.set('a', [1], None)
+        self.clock.now += 1e9
+        self.assertEqual(self.cache.get('a'), [1])
+
+    def test_renew(self):
+        self.cache.set('a', [1], 10)
+        self.clock.now += 8.
+        self.cache.set('a', [1], 10)
+        self.clock.now += 8.
+        self.assertEqual(self.cache.get('a'), [1])
+
+    def test_not_persisted(self):
+        self.cache.set('a', [1], 5, persist=False)
+        self.assertEqual(self.cache.get('a'), [1])
+        self.assertEqual(os.listdir(self.directory), [])
+        self.clock.now += 6.
+        self.assertIsNone(self.cache.get('a'))
+        for key in 'bcd':
+            self.cache.set(key, [key], 5, persist=False)
+        # Only the latest memo_size entries are held
+        self.assertEqual(list(self.cache.volatile), ['c', 'd'])
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('d'))
+
+    def test_memo(self):
+        self.assertIsNone(self.cache.recall('a'))
+        self.cache.remember('a', content_hash([1]), ['parsed'],
+                            {'etag': 'x'})
+        self.assertEqual(self.cache.recall('a'),
+                         (content_hash([1]), ['parsed'], {'etag': 'x'}))
+        self.cache.remember('b', 'digest', [])
+        self.cache.recall('a')
+        self.cache.remember('c', 'digest', [])
+        # The least recently remembered entry is dropped, recall does not
+        # count as a use
+        self.assertIsNone(self.cache.recall('a'))
+        self.assertEqual(self.cache.recall('b'), ('digest', [], {}))
+
+    def test_evict(self):
+        for i, key in enumerate('abc'):
+            self.cache.set(key, ['x' * 50], None)
+            os.utime(self.cache._path(key), (i, i))
+        small = QueryCache(self.directory, max_bytes=200)
+        small.get('a')
+        small.evict()
+        # a was read last, so b, the least recently used, is evicted first
+        self.assertIsNone(small.get('b'))
+        self.assertEqual(small.get('a'), ['x' * 50])
+        self.assertEqual(small.get('c'), ['x' * 50])
+
+    def test_namespaces(self):
+        cache.set_cache_directory(self.directory)
+        try:
+            league = cache.get_cache('1.l.1')
+            self.assertIs(league, cache.get_cache('1.l.1'))
+            self.assertEqual(league.directory,
+                             os.path.join(self.directory, '1.l.1'))
+        finally:
+            cache.set_cache_directory()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import shutil
+import tempfile
+import unittest
+
+import cache
+from backends import Result
+from ratelimit import get_limiter, set_limiter
+from changefeed import ChangeFeed
+from yahoo_tools import execute
+
+
+LEAGUE_KEY = '348.l.1'
+TEAM_KEY = '348.l.1.t.1'
+
+
+def row(player_id, points, position='QB'):
+    return {'team_key': TEAM_KEY, 'roster': {'players': {'player': {
+        'player_id': player_id, 'selected_position': {'position': position},
+        'player_points': {'total': points}}}}}
+
+class ChangeFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.feed = ChangeFeed(LEAGUE_KEY)
+        self.published = []
+        self.feed.subscribe(self.published.append)
+
+    def test_update(self):
+        rows = [row('1', '10.5'), row('2', '3'), row('3', '7', 'BN')]
+        records = self.feed.update(TEAM_KEY, rows)
+        self.assertEqual([r['player_id'] for r in records[:-1]],
+                         ['1', '2', '3'])
+        self.assertEqual(records[-1], {'type': 'team',
+                                       'league_key': LEAGUE_KEY,
+                                       'team_key': TEAM_KEY, 'points': 13.5})
+        self.assertEqual(self.published, [records])
+
+    def test_unchanged(self):
+        rows = [row('1', '10.5'), row('2', '-')]
+        self.feed.update(TEAM_KEY, rows)
+        self.assertEqual(self.feed.update(TEAM_KEY, rows), [])
+        self.assertEqual(len(self.published), 1)
+
+    def test_changed(self):
+        self.feed.update(TEAM_KEY, [row('1', '10.5'), row('2', '3')])
+        records = self.feed.update(TEAM_KEY, [row('1', '12.5'), row('2', '3')])
+        self.assertEqual(records, [
+            {'type': 'player', 'league_key': LEAGUE_KEY, 'team_key': TEAM_KEY,
+             'player_id': '1', 'points': 12.5},
+            {'type': 'team', 'league_key': LEAGUE_KEY, 'team_key': TEAM_KEY,
+             'points': 15.5}])
+        # A bench player's points change the player but not the team total
+        records = self.feed.update(TEAM_KEY, [row('1', '12.5'),
+                                              row('2', '4', 'BN')])
+        self.assertEqual([r['type'] for r in records], ['player', 'team'])
+        self.assertEqual(records[-1]['points'], 12.5)
+
+    def test_missing_points(self):
+        self.feed.update(TEAM_KEY, [row('1', '-')])
+        records = self.feed.update(TEAM_KEY, [row('1', '0')])
+        self.assertEqual(records[0]['points'], 0.)
+        records = self.feed.update(TEAM_KEY, [row('1', '-')])
+        self.assertIsNone(records[0]['points'])
+
+    def test_update_points(self):
+        changed = self.feed.update_points({'1': 2., '2': float('nan')},
+                                          {TEAM_KEY: ['1']})
+        self.assertEqual(sorted(changed), ['1', '2'])
+        self.assertEqual(self.published[0][0]['team_key'], TEAM_KEY)
+        self.assertEqual(self.feed.update_points({'1': 2., '2': None}), {})
+        self.assertEqual(self.feed.update_points({'1': 3.}), {'1': 3.})
+        self.assertEqual(len(self.published), 2)
+
+    def test_reset(self):
+        rows = [row('1', '10.5')]
+        self.feed.update(TEAM_KEY, rows)
+        self.feed.reset()
+        self.assertEqual(len(self.feed.update(TEAM_KEY, rows)), 2)
+
+    def test_unsubscribe(self):
+        self.feed.unsubscribe(self.published.append)
+        self.feed.update(TEAM_KEY, [row('1', '1')])
+        self.assertEqual(self.published, [])
+
+class CountingBackend(object):
+    """Answers every query with rows, counting the queries"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def execute(self, query, token=None, **kwargs):
+        self.queries += 1
+        return Result(self.rows)
+
+class ExecuteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        cache.set_cache_directory(self.directory)
+        self.limiter = get_limiter()
+        set_limiter(None)
+
+    def tearDown(self):
+        set_limiter(self.limiter)
+        cache.set_cache_directory()
+        shutil.rmtree(self.directory)
+
+    def test_unchanged_not_extracted(self):
+        extracted = []
+
+        def extract(rows):
+            extracted.append(rows)
+            return [r['a'] for r in rows]
+        backend = CountingBackend([{'a': 1}])
+        for _ in range(3):
+            self.assertEqual(execute(backend, None, 'q', LEAGUE_KEY,
+                                     force_refresh=True, extract=extract), [1])
+        self.assertEqual((backend.queries, len(extracted)), (3, 1))
+        backend.rows = [{'a': 2}]
+        self.assertEqual(execute(backend, None, 'q', LEAGUE_KEY,
+                                 force_refresh=True, extract=extract), [2])
+        self.assertEqual(len(extracted), 2)
+
+    def test_unchanged_renews_entry(self):
+        backend = CountingBackend([{'a': 1}])
+        execute(backend, None, 'q', LEAGUE_KEY, table='settings')
+        key = cache.QueryCache.key('q', LEAGUE_KEY, None)
+        league = cache.get_cache(LEAGUE_KEY)
+        league.set(key, [{'a': 1}], -1)
+        self.assertIsNone(league.get(key))
+        execute(backend, None, 'q', LEAGUE_KEY, table='settings')
+        self.assertEqual(league.get(key), [{'a': 1}])
+        execute(backend, None, 'q', LEAGUE_KEY, table='settings')
+        self.assertEqual(backend.queries, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import random
+import unittest
+import itertools
+
+from player import Player, Team
+from lineup import (assign, optimal_lineup, player_positions, slot_positions,
+                    starting_slots, projected)
+
+
+ROSTER_POSITIONS = ['QB', 'WR', 'RB', 'W/R/T', 'BN', 'BN', 'BN']
+POSITIONS = ['QB', 'WR', 'RB', 'TE', 'K', 'WR,TE']
+
+
+def make_player(player_id, position, selected_position, proj_points):
+    player = Player(player_id=str(player_id), display_position=position,
+                    selected_position={'position': selected_position},
+                    name={'full': 'Player %s' % player_id})
+    player.proj_points = proj_points
+    return player
+
+def brute_force(team, roster_positions):
+    """Return the best projected points of any valid lineup by trying every
+    ordering of the players in the starting slots
+    """
+    slots = starting_slots(roster_positions)
+    players = list(team.players) + [None] * len(slots)
+    best = 0.
+    for chosen in itertools.permutations(players, len(slots)):
+        points = 0.
+        for slot, player in zip(slots, chosen):
+            if player is None:
+                continue
+            if not slot_positions(slot) & player_positions(player):
+                break
+            points += projected(player)
+        else:
+            best = max(best, points)
+    return best
+
+class AssignTest(unittest.TestCase):
+    def test_brute_force(self):
+        rng = random.Random(1)
+        for _ in range(100):
+            n = rng.randint(1, 4)
+            m = rng.randint(n, 6)
+            cost = [[rng.randint(-9, 9) for _ in range(m)] for _ in range(n)]
+            cols = assign(cost)
+            self.assertEqual(len(set(cols)), n)
+            best = min(sum(cost[i][j] for i, j in enumerate(perm))
+                       for perm in itertools.permutations(range(m), n))
+            self.assertEqual(sum(cost[i][j] for i, j in enumerate(cols)), best)
+
+    def test_empty(self):
+        self.assertEqual(assign([]), [])
+
+class OptimalLineupTest(unittest.TestCase):
+    def test_brute_force(self):
+        rng = random.Random(2)
+        for _ in range(30):
+            players = [make_player(i, rng.choice(POSITIONS), 'BN',
+                                   float(rng.randint(0, 20)))
+                       for i in range(rng.randint(2, 7))]
+            team = Team(players, team_key='t', name='t')
+            lineup = optimal_lineup(team, ROSTER_POSITIONS)
+            self.assertEqual(lineup.points,
+                             brute_force(team, ROSTER_POSITIONS))
+            for slot, player in lineup.starters:
+                if player is not None:
+                    self.assertTrue(slot_positions(slot) &
+                                    player_positions(player))
+
+    def test_flex_and_bench(self):
+        players = [make_player(1, 'QB', 'QB', 20.),
+                   make_player(2, 'WR', 'WR', 10.),
+                   make_player(3, 'RB', 'RB', 8.),
+                   make_player(4, 'TE', 'W/R/T', 3.),
+                   make_player(5, 'WR', 'BN', 12.),
+                   make_player(6, 'RB', 'IR', 30.)]
+        lineup = optimal_lineup(Team(players, name='t'), ROSTER_POSITIONS)
+        self.assertEqual(lineup.points, 50.)
+        self.assertEqual(lineup.current, 41.)
+        self.assertEqual(lineup.left_on_bench, 9.)
+        self.assertEqual([p.player_id for p in lineup.changes()], ['5'])
+
+    def test_unfilled_slot(self):
+        players = [make_player(1, 'K', 'BN', 5.)]
+        lineup = optimal_lineup(Team(players, name='t'), ROSTER_POSITIONS)
+        self.assertEqual(lineup.starters, [(slot, None) for slot in
+                                           starting_slots(ROSTER_POSITIONS)])
+        self.assertEqual(lineup.points, 0.)
+
+    def test_missing_projection(self):
+        players = [make_player(1, 'QB', 'QB', float('nan')),
+                   make_player(2, 'QB', 'BN', None)]
+        lineup = optimal_lineup(Team(players, name='t'), ['QB'])
+        self.assertEqual(lineup.points, 0.)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import shutil
+import tempfile
+import unittest
+
+import cache
+import benchmarks
+from backends import Result
+from ratelimit import get_limiter, set_limiter
+from player import Player, Team, PlayerIndex
+from yahoo_tools import iter_teams
+
+
+def make_team(team_key, player_ids):
+    players = [Player(player_id=player_id,
+                      selected_position={'position': 'WR'})
+               for player_id in player_ids]
+    return Team(players, team_key=team_key, name=team_key)
+
+class PlayerIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = PlayerIndex([make_team('a', ['1', '2', '3']),
+                                  make_team('b', ['4', '5'])])
+
+    def test_index(self):
+        self.assertEqual(len(self.index), 5)
+        col, row, player = self.index.get('5')
+        self.assertEqual((col, row, player.player_id), (1, 1, '5'))
+        self.assertNotIn('6', self.index)
+
+    def test_scatter(self):
+        cells, changes = self.index.scatter('player_points',
+                                            {'2': 4., '4': 1., '9': 3.})
+        self.assertEqual(sorted(cells), [(0, 1), (1, 0)])
+        self.assertEqual(changes, {'a': True, 'b': True})
+        cells, changes = self.index.scatter('player_points',
+                                            {'2': 4., '4': 2.})
+        self.assertEqual(cells, [(0, 1)])
+        self.assertEqual(changes, {'a': False, 'b': True})
+
+    def test_fill_missing(self):
+        self.index.scatter('proj_points', {'1': 2.})
+        cells, _ = self.index.scatter('proj_points', {'2': 3.}, fill=0.,
+                                      fill_missing=True)
+        self.assertEqual(len(cells), 5)
+        self.assertEqual(self.index.get('1')[2].proj_points, 0.)
+        self.assertEqual(self.index.get('2')[2].proj_points, 3.)
+
+    def test_scatter_moved_player(self):
+        # Player 2 is traded from a to b
+        self.index.replace_team(1, make_team('b', ['4', '5', '2']))
+        self.index.replace_team(0, make_team('a', ['1', '3']))
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.get('2')[:2], (1, 2))
+        self.assertEqual(self.index.get('3')[:2], (0, 1))
+        cells, changes = self.index.scatter('player_points', {'2': 7.})
+        self.assertEqual(cells, [(2, 1)])
+        self.assertEqual(changes, {'b': True})
+        self.assertEqual(self.index.teams[1].players[2].player_points, 7.)
+
+    def test_replace_drops_players(self):
+        self.index.replace_team(0, make_team('a', ['1', '6']))
+        self.assertNotIn('2', self.index)
+        self.assertEqual(self.index.get('6')[:2], (0, 1))
+        self.assertEqual(self.index.scatter('player_points', {'2': 1.}),
+                         ([], {}))
+
+    def test_moved(self):
+        self.assertEqual(self.index.moved({'a': ['1', '2', '3'],
+                                           'b': ['4', '5']}), [])
+        self.assertEqual(self.index.moved({'a': ['1', '3', '2']}), ['a'])
+        self.assertEqual(self.index.moved({'a': ['1', '2', '3'],
+                                           'b': ['4', '5', '6']}), ['b'])
+
+class EmptyRosterBackend(benchmarks.SyntheticBackend):
+    """SyntheticBackend whose roster queries return nothing for empty"""
+    def __init__(self, num_teams, empty):
+        benchmarks.SyntheticBackend.__init__(self, num_teams)
+        self.empty = empty
+
+    def execute(self, query, token=None, **kwargs):
+        result = benchmarks.SyntheticBackend.execute(self, query, token,
+                                                     **kwargs)
+        return Result([row for row in result.rows
+                       if row.get('team_key') != self.empty])
+
+class IterTeamsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        cache.set_cache_directory(self.directory)
+        self.limiter = get_limiter()
+        set_limiter(None)
+
+    def tearDown(self):
+        set_limiter(self.limiter)
+        cache.set_cache_directory()
+        shutil.rmtree(self.directory)
+
+    def test_empty_roster_keeps_column(self):
+        empty = '%s.t.2' % benchmarks.LEAGUE_KEY
+        backend = EmptyRosterBackend(4, empty)
+        teams = list(iter_teams(backend, None, benchmarks.LEAGUE_KEY, 1))
+        self.assertEqual([team.team_key for team in teams],
+                         ['%s.t.%s' % (benchmarks.LEAGUE_KEY, i)
+                          for i in range(1, 5)])
+        self.assertEqual(teams[1].players, [])
+        self.assertEqual(teams[1].name, empty)
+        self.assertTrue(all(teams[i].players for i in (0, 2, 3)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+import time
+import threading
+import unittest
+
+import fetch
+import ratelimit
+from ratelimit import (RateLimiter, Throttled, BudgetExhausted, priority,
+                       account, inherit, current_priority, current_account,
+                       retry_after, LIVE, NORMAL, BACKGROUND)
+
+
+class FakeClock(object):
+    """Replaces the time module of ratelimit so refills can be stepped
+    exactly
+    """
+    def __init__(self, now=1000.):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        ratelimit.time = self.clock
+
+    def tearDown(self):
+        ratelimit.time = time
+
+    def test_burst(self):
+        limiter = RateLimiter(1., 5)
+        for _ in range(5):
+            limiter.acquire(LIVE)
+        self.assertEqual(limiter.tokens, 0.)
+        self.assertEqual(limiter.counters()['requests'], 5)
+        self.assertEqual(limiter.counters()['waits'], 0)
+
+    def test_refill(self):
+        limiter = RateLimiter(2., 4)
+        for _ in range(4):
+            limiter.acquire(LIVE)
+        self.clock.now += 1.
+        limiter.counters()
+        self.assertEqual(limiter.tokens, 2.)
+        self.clock.now += 60.
+        limiter.counters()
+        self.assertEqual(limiter.tokens, 4.)
+
+    def test_reserve(self):
+        limiter = RateLimiter(1., 4)
+        limiter.acquire(BACKGROUND)
+        limiter.acquire(BACKGROUND)
+        # Half the bucket is left for NORMAL and LIVE
+        self.assertRaises(_Blocked, self.acquire_now, limiter, BACKGROUND)
+        limiter.acquire(NORMAL)
+        self.assertRaises(_Blocked, self.acquire_now, limiter, NORMAL)
+        limiter.acquire(LIVE)
+        self.assertEqual(limiter.tokens, 0.)
+
+    def test_burst_of_one(self):
+        limiter = RateLimiter(1., 1)
+        for level in (LIVE, NORMAL, BACKGROUND):
+            limiter.acquire(level)
+            self.clock.now += 1.
+        self.assertEqual(limiter.counters()['requests'], 3)
+
+    def test_invalid_burst(self):
+        self.assertRaises(ValueError, RateLimiter, 1., 0)
+
+    def test_budget(self):
+        limiter = RateLimiter(100., 10, budget=2, period=60.)
+        limiter.acquire(NORMAL)
+        limiter.acquire(BACKGROUND)
+        self.assertRaises(BudgetExhausted, limiter.acquire, NORMAL)
+        self.assertRaises(BudgetExhausted, limiter.acquire, BACKGROUND)
+        limiter.acquire(LIVE)
+        counts = limiter.counters()
+        self.assertEqual((counts['used'], counts['remaining']), (3, 0))
+        self.clock.now += 60.
+        limiter.acquire(NORMAL)
+        self.assertEqual(limiter.counters()['remaining'], 1)
+
+    def test_accounts(self):
+        limiter = RateLimiter(100., 10, budget=10, period=60.)
+        limiter.register('a')
+        limiter.register('b')
+        with account('a'):
+            for _ in range(4):
+                limiter.acquire(LIVE)
+        limiter.acquire(LIVE)
+        self.assertEqual(limiter.counters()['accounts'], {'a': 4, 'b': 0})
+        self.assertEqual(limiter.counters()['used'], 5)
+        self.assertTrue(limiter.allow('a'))
+        self.assertFalse(limiter.allow('a', 2))
+        self.assertTrue(limiter.allow('b', 5))
+        self.clock.now += 60.
+        self.assertTrue(limiter.allow('a', 5))
+        self.assertEqual(limiter.counters()['accounts'], {'a': 0, 'b': 0})
+
+    def test_allow_without_budget(self):
+        limiter = RateLimiter(100., 10)
+        self.assertTrue(limiter.allow('a', 1000))
+
+    def test_throttled(self):
+        limiter = RateLimiter(100., 10, backoff=2.)
+        limiter.throttled()
+        self.assertEqual(limiter.tokens, 0.)
+        self.assertEqual(limiter.blocked_until, self.clock.now + 2.)
+        limiter.throttled()
+        self.assertEqual(limiter.blocked_until, self.clock.now + 4.)
+        limiter.succeeded()
+        limiter.throttled(1.)
+        self.assertEqual(limiter.blocked_until, self.clock.now + 4.)
+        self.assertEqual(limiter.counters()['throttled'], 3)
+        self.assertRaises(_Blocked, self.acquire_now, limiter, LIVE)
+        self.clock.now += 5.
+        limiter.acquire(LIVE)
+
+    def acquire_now(self, limiter, level):
+        """Acquire without blocking, raising _Blocked if acquire would wait"""
+        cond = limiter._cond
+        wait = cond.wait
+
+        def blocked(timeout=None):
+            raise _Blocked()
+        cond.wait = blocked
+        try:
+            limiter.acquire(level)
+        finally:
+            cond.wait = wait
+
+class _Blocked(Exception):
+    pass
+
+class CallTest(unittest.TestCase):
+    def test_waits_counted(self):
+        limiter = RateLimiter(50., 1)
+        limiter.acquire(LIVE)
+        started = time.time()
+        limiter.acquire(LIVE)
+        self.assertGreater(time.time() - started, 0.01)
+        counts = limiter.counters()
+        self.assertEqual((counts['requests'], counts['waits']), (2, 1))
+        self.assertGreater(counts['wait_time'], 0.)
+
+    def test_call_retries_throttled(self):
+        limiter = RateLimiter(1000., 1, backoff=0.)
+        calls = []
+
+        def request():
+            calls.append(1)
+            if len(calls) < 3:
+                raise Throttled(0.)
+            return 'rows'
+        self.assertEqual(limiter.call(request, retries=3), 'rows')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(limiter.counters()['throttled'], 2)
+
+    def test_call_gives_up(self):
+        limiter = RateLimiter(1000., 1, backoff=0.)
+        calls = []
+
+        def request():
+            calls.append(1)
+            raise Throttled(0.)
+        self.assertRaises(Throttled, limiter.call, request, 2)
+        self.assertEqual(len(calls), 3)
+
+class PriorityTest(unittest.TestCase):
+    def test_priority(self):
+        self.assertEqual(current_priority(), NORMAL)
+        with priority(LIVE):
+            self.assertEqual(current_priority(), LIVE)
+            with priority(BACKGROUND):
+                self.assertEqual(current_priority(), BACKGROUND)
+            self.assertEqual(current_priority(), LIVE)
+        self.assertEqual(current_priority(), NORMAL)
+
+    def test_inherit(self):
+        seen = []
+        with priority(LIVE):
+            with account('a'):
+                fn = inherit(lambda: seen.append((current_priority(),
+                                                  current_account())))
+        thread = threading.Thread(target=fn)
+        thread.start()
+        thread.join()
+        self.assertEqual(seen, [(LIVE, 'a')])
+        self.assertIsNone(current_account())
+
+    def test_retry_after(self):
+        retry_after(200, {})
+        with self.assertRaises(Throttled) as cm:
+            retry_after(429, {'Retry-After': '30'})
+        self.assertEqual(cm.exception.delay, 30.)
+        with self.assertRaises(Throttled) as cm:
+            retry_after(999, {})
+        self.assertIsNone(cm.exception.delay)
+
+class FetchTest(unittest.TestCase):
+    def test_throttled_not_retried(self):
+        calls = []
+
+        def request(item):
+            calls.append(item)
+            raise Throttled(0.)
+        self.assertRaises(Throttled, list, fetch.fetch_iter(
+            request, [1], max_workers=1, retries=3, backoff=0.))
+        self.assertEqual(calls, [1])
+
+    def test_budget_not_retried(self):
+        calls = []
+
+        def request(item):
+            calls.append(item)
+            raise BudgetExhausted(60.)
+        self.assertRaises(BudgetExhausted, list, fetch.fetch_iter(
+            request, [1], max_workers=1, retries=3, backoff=0.))
+        self.assertEqual(calls, [1])
+
+    def test_errors_retried(self):
+        calls = []
+
+        def request(item):
+            calls.append(item)
+            if len(calls) < 3:
+                raise ValueError(item)
+            return item
+        self.assertEqual(fetch.fetch_all(request, [1], max_workers=1,
+                                         retries=3, backoff=0.), [1])
+        self.assertEqual(calls, [1, 1, 1])
+
+if __name__ == '__main__':
+    unittest.main()
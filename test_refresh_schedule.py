@@ -0,0 +1,105 @@
+import datetime
+import unittest
+
+import refresh_schedule
+from refresh_schedule import RefreshSchedule, in_game_window
+
+
+# A Sunday afternoon and a Tuesday morning of the 2016 season
+SUNDAY = datetime.datetime(2016, 10, 2, 14)
+TUESDAY = datetime.datetime(2016, 10, 4, 9)
+SEASON = (datetime.date(2016, 9, 8), datetime.date(2017, 1, 2))
+TEAM_KEYS = ['a', 'b', 'c']
+
+
+def team(team_key, remaining_games, live_games):
+    return {'team_key': team_key, 'remaining_games': remaining_games,
+            'live_games': live_games}
+
+class InGameWindowTest(unittest.TestCase):
+    def test_windows(self):
+        self.assertTrue(in_game_window(SUNDAY))
+        self.assertFalse(in_game_window(TUESDAY))
+        self.assertTrue(in_game_window(datetime.datetime(2016, 10, 3, 0, 30)))
+        self.assertTrue(in_game_window(datetime.datetime(2016, 10, 6, 21)))
+
+    def test_season(self):
+        self.assertTrue(in_game_window(SUNDAY, season=SEASON))
+        offseason = datetime.datetime(2017, 3, 5, 14)
+        self.assertTrue(in_game_window(offseason))
+        self.assertFalse(in_game_window(offseason, season=SEASON))
+
+    def test_eastern_time(self):
+        self.assertEqual(
+            refresh_schedule.eastern_time(datetime.datetime(2016, 11, 6, 5)),
+            datetime.datetime(2016, 11, 6, 1))
+        self.assertEqual(
+            refresh_schedule.eastern_time(datetime.datetime(2016, 11, 6, 7)),
+            datetime.datetime(2016, 11, 6, 2))
+
+class RefreshScheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.schedule = RefreshSchedule(1000, max_interval=8000,
+                                        idle_interval=60000, settle_ticks=2,
+                                        recheck_ticks=5, season=SEASON)
+
+    def test_backoff(self):
+        self.assertEqual(self.schedule.interval(SUNDAY), 1000)
+        intervals = []
+        for _ in range(5):
+            self.schedule.record({'a': False})
+            intervals.append(self.schedule.interval(SUNDAY))
+        self.assertEqual(intervals, [2000, 4000, 8000, 8000, 8000])
+        self.schedule.record({'a': False, 'b': True})
+        self.assertEqual(self.schedule.interval(SUNDAY), 1000)
+
+    def test_idle(self):
+        self.assertEqual(self.schedule.interval(TUESDAY), 60000)
+        self.schedule.set_season((datetime.date(2017, 9, 7),
+                                  datetime.date(2018, 1, 1)))
+        self.assertEqual(self.schedule.interval(SUNDAY), 60000)
+        self.schedule.set_season(None)
+        self.assertEqual(self.schedule.interval(SUNDAY), 1000)
+
+    def test_settled_teams_skipped(self):
+        self.assertEqual(self.schedule.teams_due(TEAM_KEYS), TEAM_KEYS)
+        self.schedule.record({'a': False, 'b': True, 'c': False})
+        self.schedule.record({'a': False, 'b': True, 'c': True})
+        self.assertEqual(self.schedule.teams_due(TEAM_KEYS), ['b', 'c'])
+        self.schedule.record({'b': False, 'c': False})
+        self.schedule.record({'b': False, 'c': False})
+        self.assertEqual(self.schedule.teams_due(TEAM_KEYS), [])
+        self.assertEqual(self.schedule.teams_due(TEAM_KEYS), [])
+        # Every recheck_ticks refreshes all of the teams are due again
+        self.assertEqual(self.schedule.teams_due(TEAM_KEYS), TEAM_KEYS)
+        self.schedule.record({'a': True})
+        self.assertEqual(self.schedule.teams_due(TEAM_KEYS), ['a'])
+
+    def test_scoreboard(self):
+        self.assertTrue(self.schedule.scoreboard_due())
+        self.assertFalse(self.schedule.scoreboard_due())
+        self.schedule.record_scoreboard([[team('a', 0, 0), team('b', 1, 0)],
+                                         [team('c', 0, 1), {'team_key': 'd'}]])
+        self.assertEqual(self.schedule.teams_due(TEAM_KEYS + ['d']),
+                         ['b', 'c', 'd'])
+        # A live game keeps the fast interval outside the game windows
+        self.assertTrue(self.schedule.live)
+        self.assertEqual(self.schedule.interval(TUESDAY), 1000)
+
+    def test_all_finished(self):
+        self.schedule.record_scoreboard([[team('a', 0, 0), team('b', 0, 0)]])
+        self.assertTrue(self.schedule.all_finished)
+        self.assertEqual(self.schedule.interval(SUNDAY), 60000)
+        self.assertEqual(self.schedule.teams_due(['a', 'b']), [])
+
+    def test_new_week_forgets_scoreboard(self):
+        self.schedule.scoreboard_due()
+        self.schedule.record_scoreboard([[team('a', 0, 0), team('b', 0, 0)]])
+        self.schedule.scoreboard_week -= datetime.timedelta(weeks=1)
+        self.assertEqual(self.schedule.interval(SUNDAY), 1000)
+        self.assertFalse(self.schedule.all_finished)
+        self.assertEqual(self.schedule.teams_due(['a', 'b']), ['a', 'b'])
+        self.assertTrue(self.schedule.scoreboard_due())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import math
+import unittest
+
+import numpy as np
+
+from player import Player, Team
+from simulate import (PositionModel, simulate_team, win_probability,
+                      matchup_odds, playoff_odds, MIN_SAMPLES)
+
+
+def make_team(team_key, starters):
+    """Return a Team with a starter for each (position, points, proj_points)
+    """
+    players = []
+    for i, (position, points, proj_points) in enumerate(starters):
+        player = Player(player_id='%s.%s' % (team_key, i),
+                        display_position=position,
+                        selected_position={'position': position},
+                        player_points={'total': str(points)})
+        player.proj_points = proj_points
+        players.append(player)
+    return Team(players, team_key=team_key, name=team_key)
+
+def normal_cdf(x):
+    return 0.5 * (1. + math.erf(x / math.sqrt(2.)))
+
+class WinProbabilityTest(unittest.TestCase):
+    def test_normal(self):
+        # Neither QB has played, so the margin is normal with mean 5 and the
+        # QB spread of 7 from each team
+        a = make_team('a', [('QB', 0., 20.)])
+        b = make_team('b', [('QB', 0., 15.)])
+        expected = normal_cdf(5. / math.sqrt(2 * 7. ** 2))
+        p = win_probability(a, b, n=40000, seed=1)
+        self.assertAlmostEqual(p, expected, delta=0.01)
+        self.assertAlmostEqual(win_probability(b, a, n=40000, seed=1),
+                               1. - p, delta=0.01)
+
+    def test_symmetric(self):
+        a = make_team('a', [('QB', 5., 20.), ('WR', 3., 10.)])
+        b = make_team('b', [('QB', 5., 20.), ('WR', 3., 10.)])
+        self.assertAlmostEqual(win_probability(a, b, n=40000, seed=2), 0.5,
+                               delta=0.01)
+
+    def test_finished(self):
+        a = make_team('a', [('QB', 20., 20.), ('K', 9., 8.)])
+        b = make_team('b', [('QB', 25., 25.), ('K', 3., 3.)])
+        self.assertEqual(win_probability(a, b, n=1000, seed=3), 1.)
+        tied = make_team('c', [('QB', 29., 29.)])
+        self.assertEqual(win_probability(a, tied, n=1000, seed=3), 0.5)
+
+    def test_seed(self):
+        a = make_team('a', [('QB', 0., 20.)])
+        b = make_team('b', [('RB', 0., 18.)])
+        self.assertEqual(win_probability(a, b, n=1000, seed=4),
+                         win_probability(a, b, n=1000, seed=4))
+
+    def test_simulate_team(self):
+        team = make_team('a', [('QB', 10., 20.), ('WR', float('nan'), 8.)])
+        scores = simulate_team(team, PositionModel(), 20000,
+                               np.random.RandomState(5))
+        self.assertEqual(scores.shape, (20000,))
+        self.assertAlmostEqual(scores.mean(), 28., delta=0.2)
+
+class MatchupOddsTest(unittest.TestCase):
+    def test_odds(self):
+        teams = [make_team('a', [('QB', 0., 20.)]),
+                 make_team('b', [('QB', 0., 15.)]),
+                 make_team('c', [('QB', 0., float('nan'))]),
+                 make_team('d', [('QB', 0., None)])]
+        matchups = [[{'team_key': 'a'}, {'team_key': 'b'}],
+                    [{'team_key': 'c'}, {'team_key': 'd'}],
+                    [{'team_key': 'a'}, {'team_key': 'x'}]]
+        odds = matchup_odds(teams, matchups, n=1000, seed=6)
+        self.assertEqual(sorted(odds), ['a', 'b'])
+        self.assertAlmostEqual(odds['a'] + odds['b'], 1.)
+        self.assertGreater(odds['a'], 0.5)
+
+class PositionModelTest(unittest.TestCase):
+    def test_from_season(self):
+        errors = [float(i % 5 - 2) for i in range(MIN_SAMPLES)]
+        teams = [make_team('a', [('QB', 20. + e, 20.) for e in errors] +
+                                [('K', 5., 4.)])]
+        model = PositionModel.from_season({1: teams})
+        self.assertEqual(sorted(model.errors), ['QB'])
+        noise = model.sample(['QB', 'K'], 1000, np.random.RandomState(7))
+        self.assertEqual(noise.shape, (1000, 2))
+        self.assertTrue(set(noise[:, 0]) <= set(errors))
+
+class PlayoffOddsTest(unittest.TestCase):
+    def test_playoff_odds(self):
+        history = np.array([[100., 90., 80., 70.], [110., 85., 75., 65.]])
+        schedule = [[(0, 1), (2, 3)], [(0, 2), (1, 3)]]
+        wins = [10, 5, 5, 0]
+        odds = playoff_odds(wins, [0.] * 4, history, schedule,
+                            playoff_teams=2, n=5000, seed=8)
+        self.assertAlmostEqual(odds.sum(), 2.)
+        self.assertEqual(odds[0], 1.)
+        self.assertEqual(odds[3], 0.)
+        self.assertGreater(odds[1], odds[2])
+
+    def test_processes(self):
+        history = np.array([[100., 90.], [110., 85.]])
+        odds = playoff_odds([1, 1], [0., 0.], history, [[(0, 1)]],
+                            playoff_teams=1, n=1000, seed=9, processes=2)
+        self.assertAlmostEqual(odds.sum(), 1.)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,31 +1,58 @@
 import os
+import sys
+import json
 import datetime
 
-import yql
-from yql.storage import FileTokenStore
-from dateutil.relativedelta import relativedelta, TH
-
 from data import config
-from projected_stats import get_all_points
-from player import Player, Team
+from backends import YQLBackend, QueryError
+from cache import get_cache, content_hash, TTLS
+from fetch import fetch_iter
+from ratelimit import limited, retry_after, account
+import instrument
+from player import Player, Team, StatIndex, PlayerIndex, to_float
 
 
 start_date = datetime.datetime(2015, 9, 10)
-week_dates = [(start_date + relativedelta(weeks=x)).date() for x in range(16)]
+week_dates = [(start_date + datetime.timedelta(weeks=x)).date()
+              for x in range(16)]
+
+def week_start(date=None):
+    """Return the Thursday starting the nfl week that date lies within
+
+    Parameters
+    ----------
+    date: datetime.date
+        The date to test.  Defaults to today
+
+    Returns
+    -------
+    datetime.date
+
+    >>> week_start(datetime.date(2016, 9, 13))
+    datetime.date(2016, 9, 8)
+    """
+    from dateutil.relativedelta import relativedelta, TH
 
-def get_week(date=None):
-    """Get the week for the 2015 nfl season that date lies within.  If date is
-    before or after the 16 week season None is returned
+    if date is None:
+        date = datetime.datetime.now().date()
+    return date + relativedelta(weekday=TH(-1))
+
+def get_week(date=None, season=None):
+    """Get the week of the nfl season that date lies within.  If date is
+    before or after the season None is returned
 
     Parameters
     ----------
     date: datetime.date
-        The date to test for the nfl week
+        The date to test for the nfl week.  Defaults to today
+    season: tuple(datetime.date, datetime.date)
+        The first and last day of the season, as in get_league_settings.
+        Defaults to None, the 16 weeks of the 2015 season
 
     Returns
     -------
     int, None
-        The week number or None if the date is not in the 2015 nfl season
+        The week number or None if the date is not in the season
 
     >>> get_week(datetime.date(2015, 9, 15))
     1
@@ -35,16 +62,150 @@ def get_week(date=None):
     16
     >>> get_week(datetime.date(2016, 1, 10))
 
+    >>> season = (datetime.date(2016, 9, 8), datetime.date(2016, 12, 26))
+    >>> get_week(datetime.date(2016, 9, 20), season)
+    2
+    >>> get_week(datetime.date(2016, 12, 30), season)
+
     """
     if date is None:
         date = datetime.datetime.now().date()
-    last_start = date + relativedelta(weekday=TH(-1))
+    if season is not None:
+        first, last = season
+        if not first <= date <= last:
+            return None
+        return (week_start(date) - week_start(first)).days // 7 + 1
     try:
-        week_num = week_dates.index(last_start) + 1
+        week_num = week_dates.index(week_start(date)) + 1
     except ValueError:
         week_num = None
     return week_num
 
+def is_closed_week(week):
+    """Return True if week has finished so its stats can no longer change
+
+    Parameters
+    ----------
+    week: int, str, None
+        The week to test.  None is treated as the live week
+
+    Returns
+    -------
+    bool
+
+    >>> is_closed_week(None)
+    False
+    """
+    if week is None:
+        return False
+    current = get_week()
+    if current is None:
+        return datetime.datetime.now().date() > week_dates[-1]
+    return int(week) < current
+
+def query_errors():
+    """Return the exception types a failed query raises.  A bare
+    yql.ThreeLegged raises yql.YQLError, but yql is only checked for once
+    something else has imported it so backends can run without it
+
+    Returns
+    -------
+    tuple
+    """
+    yql = sys.modules.get('yql')
+    if yql is None:
+        return (QueryError,)
+    return (QueryError, yql.YQLError)
+
+def execute(y3, token, query, league_key=None, week=None, table='live',
+            force_refresh=False, extract=None, **kwargs):
+    """Execute query on y3 and return the rows, serving them from the on-disk
+    cache when a fresh copy exists.  yql has already decoded every response,
+    but if a refresh returns the same content as the previous one the rows
+    extracted from it are returned again without running extract, and the
+    cache entry is only renewed
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The connection to use for the query
+    token: yql.YahooToken
+        The token used to secure y3
+    query: str
+        The yql query
+    league_key: str
+        The league_key the query is for, part of the cache key and the cache
+        namespace.  Defaults to None
+    week: int
+        The week the query is for, part of the cache key.  Completed weeks are
+        cached forever.  Defaults to None
+    table: str
+        Either 'settings' or 'live', selects the ttl from cache.TTLS.  Live
+        rows of an open week are only cached in memory.  Defaults to 'live'
+    force_refresh: bool
+        If True the cache is bypassed and the entry replaced.  Defaults to False
+    extract: function
+        Applied to the rows from y3 before they are cached, keeping only the
+        fields that are used so later reads decode a much smaller tree.  Its
+        name is part of the cache key.  Defaults to None, caching every field
+    kwargs:
+        Passed through to y3.execute
+
+    Returns
+    -------
+    list
+        The rows returned by the query
+    """
+    cache = get_cache(league_key)
+    if extract is not None:
+        key = cache.key('%s | %s' % (query, extract.__name__), league_key, week)
+    else:
+        key = cache.key(query, league_key, week)
+    if not force_refresh:
+        with instrument.span('cache_get') as span:
+            rows = cache.get(key)
+            span.add(hits=rows is not None)
+        if rows is not None:
+            return rows
+    def request():
+        try:
+            return y3.execute(query, token=token, **kwargs).rows
+        except query_errors() as e:
+            resp = getattr(e, 'resp', None)
+            retry_after(getattr(resp, 'status', None), resp)
+            raise
+    with instrument.span('yql_query') as span:
+        with account(league_key):
+            rows = limited(request)
+        if instrument.enabled():
+            span.add(rows=len(rows), bytes=len(json.dumps(rows)))
+    if table == 'live' and is_closed_week(week):
+        table = 'closed'
+    digest = content_hash(rows)
+    previous = cache.recall(key)
+    if previous is not None and previous[0] == digest:
+        with instrument.span('unchanged'):
+            # Renew the entry so unchanged content is still served from cache
+            cache.set(key, previous[1], TTLS[table], persist=table != 'live')
+            return previous[1]
+    if extract is not None:
+        with instrument.span('extract') as span:
+            rows = extract(rows)
+            if instrument.enabled():
+                span.add(bytes=len(json.dumps(rows)))
+    cache.set(key, rows, TTLS[table], persist=table != 'live')
+    cache.remember(key, digest, rows)
+    return rows
+
+def get_token_store():
+    """Return the FileTokenStore holding the cached token in ~/YahooFF/"""
+    from yql.storage import FileTokenStore
+
+    _cache_dir = os.path.expanduser('~/YahooFF')
+    if not os.access(_cache_dir, os.R_OK):
+        os.mkdir(_cache_dir)
+    return FileTokenStore(_cache_dir, secret='sasfasdfdasfdaf')
+
 def get_token(y3, dialog=None):
     """Check if there is a cached token and if so retrieve it else ask the user
     for a new token using dialog.
@@ -61,10 +222,7 @@ def get_token(y3, dialog=None):
     yql.YahooToken
         Either the cached token or a newly requested token
     """
-    _cache_dir = os.path.expanduser('~/YahooFF')
-    if not os.access(_cache_dir, os.R_OK):
-        os.mkdir(_cache_dir)
-    token_store = FileTokenStore(_cache_dir, secret='sasfasdfdasfdaf')
+    token_store = get_token_store()
     stored_token = token_store.get('foo')
     if not stored_token:
         request_token, auth_url = y3.get_token_and_auth_url()
@@ -81,7 +239,133 @@ def get_token(y3, dialog=None):
             token_store.set('foo', token)
     return token
 
-def get_teams_stats(y3, token, league_key, week, num_teams=12):
+def get_team_keys(league_key, num_teams=12):
+    """Return the team_keys for every team in the league
+
+    Parameters
+    ----------
+    league_key: str
+        The league_key in the form XXX.l.XXXX
+    num_teams: int
+        The number of teams in the league.  Defaults to 12
+
+    Returns
+    -------
+    list[str]
+        The team_keys in the form XXX.l.XXXX.t.X ordered by team number
+    """
+    return ['%s.t.%s' % (league_key, team) for team in range(1, num_teams + 1)]
+
+def iter_roster_rows(y3, token, fields, team_keys, week=None, batch_size=None,
+                     max_workers=None, force_refresh=False, **kwargs):
+    """Query fantasysports.teams.roster.stats for all of team_keys using
+    batched team_key IN (...) queries and split the rows back out per team.
+    If the server rejects a batch, or leaves a team out of its rows, those teams
+    are queried individually and concurrently.
+    The rows for each team are yielded as soon as its batch has arrived
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The connection to use to query teams and player data
+    token: yql.YahooToken
+        Token to use to secure y3
+    fields: str
+        The fields to select.  team_key is always selected as well so that rows
+        can be matched to their team
+    team_keys: list[str]
+        The team_keys to query
+    week: int
+        The week to query, if None the current week.  Defaults to None
+    batch_size: int
+        The maximum number of teams per query.  If None the value from the
+        config file is used.  Defaults to None
+    max_workers: int
+        The number of batches to query concurrently.  If None the value from
+        the config file is used.  Defaults to None
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
+    kwargs:
+        Passed through to y3.execute
+
+    Yields
+    ------
+    tuple(str, list)
+        The team_key and the rows returned for it in the same order as
+        team_keys
+    """
+    if batch_size is None:
+        batch_size = config.get_batch_size()
+    if fields != '*':
+        fields = 'team_key, ' + fields
+    template = """SELECT %s
+                    FROM fantasysports.teams.roster.stats
+                   WHERE team_key %s"""
+    if week is not None:
+        template += " AND week='%s'" % week
+
+    league_key = team_keys[0].rsplit('.t.', 1)[0] if team_keys else None
+
+    def query(condition):
+        return execute(y3, token, template % (fields, condition), league_key,
+                       week, force_refresh=force_refresh, **kwargs)
+
+    def fetch(batch):
+        if len(batch) == 1:
+            return query("='%s'" % batch[0])
+        condition = 'IN (%s)' % ', '.join("'%s'" % k for k in batch)
+        try:
+            return query(condition)
+        except query_errors():
+            return None
+
+    def single(team_key):
+        return query("='%s'" % team_key)
+
+    batches = [team_keys[i:i + batch_size]
+               for i in range(0, len(team_keys), batch_size)]
+    for batch, rows in zip(batches, fetch_iter(fetch, batches, max_workers)):
+        team_rows = dict((team_key, []) for team_key in batch)
+        for row in rows or []:
+            team_rows[row['team_key']].append(row)
+        # Teams in a rejected batch, or missing from its rows, are queried
+        # individually and concurrently
+        missing = []
+        if len(batch) > 1:
+            missing = [team_key for team_key in batch
+                       if not team_rows[team_key]]
+        for team_key, rows in zip(missing,
+                                  fetch_iter(single, missing, max_workers)):
+            team_rows[team_key] = rows
+        for team_key in batch:
+            yield team_key, team_rows[team_key]
+
+def get_roster_rows(y3, token, fields, team_keys, **kwargs):
+    """Return the rows from iter_roster_rows as a list
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The connection to use to query teams and player data
+    token: yql.YahooToken
+        Token to use to secure y3
+    fields: str
+        The fields to select
+    team_keys: list[str]
+        The team_keys to query
+    kwargs:
+        Passed through to iter_roster_rows
+
+    Returns
+    -------
+    list[list]
+        The rows returned for each team in the same order as team_keys
+    """
+    return [rows for _, rows in
+            iter_roster_rows(y3, token, fields, team_keys, **kwargs)]
+
+def get_teams_stats(y3, token, league_key, week, num_teams=None,
+                    max_workers=None, force_refresh=False):
     """Query the y3 connection and retunr the player stats data as a list of
     dicts
 
@@ -96,24 +380,87 @@ def get_teams_stats(y3, token, league_key, week, num_teams=12):
     week: int
         The week to query for player stats
     num_teams: int
-        The number of teams in the league.  Defaults to 12.
+        The number of teams in the league.  If None it is read from the league
+        settings.  Defaults to None
+    max_workers: int
+        The number of batches to query concurrently.  If None the value from
+        the config file is used.  Defaults to None
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
 
     Returns
     -------
     list
         the list of the raw data returned from the query in json format/list of
-        dicts
+        dicts ordered by team number
+    """
+    num_teams = get_num_teams(y3, token, league_key, num_teams)
+    team_keys = get_team_keys(league_key, num_teams)
+    team_rows = get_roster_rows(y3, token, '*', team_keys, week=week,
+                                max_workers=max_workers,
+                                force_refresh=force_refresh, output='json')
+    return [rows[0] for rows in team_rows]
+
+def get_league_settings(y3, token, league_key, force_refresh=False):
+    """Return the settings of the league needed to size queries and tables,
+    fetched in a single query and cached with the other settings
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The connection to use for the yql query
+    token: yql.YahooToken
+        The token used to secure the y3 connection
+    league_key: str
+        The league_key to use for the query in the form XXX.l.XXXX
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
+
+    Returns
+    -------
+    dict
+        num_teams, the int number of teams.  team_keys, the list of team_keys.
+        roster_positions, the list of roster slot positions in roster order
+        e.g. ['QB', 'WR', 'WR', ...].  stat_categories, the dict of stat_id to
+        stat description.  stat_modifiers, the dict of stat_id to modifier as a
+        float.  season, the tuple of the first and last datetime.date of the
+        season or None if the league does not give them
     """
-    data = []
-    for team in range(1, num_teams + 1):
-        query = """SELECT *
-                     FROM fantasysports.teams.roster.stats
-                    WHERE team_key='%s.t.%s'""" % (league_key, team)
-        data_yql = y3.execute(query, token=token, output='json')
-        data.append(data_yql.rows[0])
-    return data
-
-def get_stat_categories(y3, token, league_key):
+    query = """SELECT num_teams, start_date, end_date, settings
+                 FROM fantasysports.leagues.settings
+                WHERE league_key='%s'""" % league_key
+    row = execute(y3, token, query, league_key, table='settings',
+                  force_refresh=force_refresh)[0]
+    settings = row['settings']
+    num_teams = int(row['num_teams'])
+    roster_positions = []
+    for position in settings['roster_positions']['roster_position']:
+        roster_positions += [position['position']] * int(position['count'])
+    stat_categories = settings['stat_categories']['stats']['stat']
+    stat_modifiers = settings['stat_modifiers']['stats']['stat']
+    season = None
+    if row.get('start_date') and row.get('end_date'):
+        season = tuple(
+            datetime.datetime.strptime(row[k], '%Y-%m-%d').date()
+            for k in ('start_date', 'end_date'))
+    return dict(
+        num_teams=num_teams,
+        team_keys=get_team_keys(league_key, num_teams),
+        roster_positions=roster_positions,
+        stat_categories={x['stat_id']: x['name'] for x in stat_categories},
+        stat_modifiers={x['stat_id']: float(x['value'])
+                        for x in stat_modifiers},
+        season=season)
+
+def get_num_teams(y3, token, league_key, num_teams=None):
+    """Return num_teams, or the number of teams in the league from
+    get_league_settings if num_teams is None
+    """
+    if num_teams is None:
+        num_teams = get_league_settings(y3, token, league_key)['num_teams']
+    return num_teams
+
+def get_stat_categories(y3, token, league_key, force_refresh=False):
     """Return the stat_categories for the nfl league, a dict mapping stat_id to
     stat description
 
@@ -125,6 +472,8 @@ def get_stat_categories(y3, token, league_key):
         The token used to secure the y3 connection
     league_key: str
         The league_key to use for the query in the form XXX.l.XXXX
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
 
     Returns
     -------
@@ -132,16 +481,36 @@ def get_stat_categories(y3, token, league_key):
         The dict mapping stat_id to stat description.  Keys are unicode strings
         as are values
     """
-    query = """SELECT settings.stat_categories
-                 FROM fantasysports.leagues.settings
-                WHERE league_key='%s'""" % league_key
-    data_yql = y3.execute(query, token=token)
-    stat_categories = data_yql.rows[0]
-    stat_categories = stat_categories['settings']['stat_categories']['stats']['stat']
-    stat_categories = {x['stat_id']: x['name'] for x in stat_categories}
-    return stat_categories
+    settings = get_league_settings(y3, token, league_key, force_refresh)
+    return settings['stat_categories']
+
+def get_stat_modifiers(y3, token, league_key, force_refresh=False):
+    """Return the scoring modifiers for the nfl league, a dict mapping stat_id
+    to the fantasy points scored per unit of the stat
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The connection to use for the yql query
+    token: yql.YahooToken
+        The token used to secure the y3 connection
+    league_key: str
+        The league_key to use for the query in the form XXX.l.XXXX
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
+
+    Returns
+    -------
+    dict
+        The dict mapping stat_id to modifier.  Keys are unicode strings and
+        values are floats
+    """
+    settings = get_league_settings(y3, token, league_key, force_refresh)
+    return settings['stat_modifiers']
 
-def load_teams(week=None, dialog=None, get_proj_points=False, y3=None):
+def load_teams(week=None, dialog=None, get_proj_points=False, y3=None,
+               force_refresh=False, backend=None, league_key=None,
+               num_teams=None):
     """Queries yql and created a list of Team objects containing a list of
     player objects
 
@@ -155,24 +524,42 @@ def load_teams(week=None, dialog=None, get_proj_points=False, y3=None):
         If set to True calls get_all_points and appends proj_points to all
         player objects.  Defaults to False
     y3: yql.ThreeLegged
-        The oauth connection to use for queries.  If None then get_y3() will be
-        called.  Defaults to None
+        The oauth connection to use for queries if backend is None.  If None
+        then get_y3() will be called.  Defaults to None
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
+    backend: backends.Backend
+        The source of the league data.  If None a YQLBackend using y3 is used.
+        Defaults to None
+    league_key: str
+        The league_key in the form XXX.l.XXXX.  If None the league_key from the
+        config file is used.  Defaults to None
+    num_teams: int
+        The number of teams in the league.  If None it is read from the league
+        settings.  Defaults to None
 
     Returns
     -------
     list[team]
         A list of the team objects that were created by the yql query
     """
-    league_key = config.get_league_key()
-    if y3 is None:
-        y3 = get_y3()
-    token = get_token(y3, dialog)
-    teams = construct_teams_and_players(y3, token, league_key, week)
-    if get_proj_points:
-        projected_stats = get_all_points()
-        for team in teams:
-            for player in team.players:
-                player.proj_points = projected_stats.get(player.player_id, None)
+    if league_key is None:
+        league_key = config.get_league_key()
+    if backend is None:
+        backend = YQLBackend(y3)
+    with instrument.span('load_teams'):
+        with instrument.span('check_token'):
+            token = backend.get_token(dialog)
+        num_teams = get_num_teams(backend, token, league_key, num_teams)
+        teams = construct_teams_and_players(backend, token, league_key, week,
+                                            force_refresh, num_teams=num_teams)
+        if get_proj_points:
+            from projected_stats import get_all_points
+            projected_stats = get_all_points(
+                week, num_teams, force_refresh=force_refresh,
+                closed=is_closed_week(week), backend=backend,
+                league_key=league_key)
+            PlayerIndex(teams).scatter('proj_points', projected_stats)
     return teams
 
 def get_y3():
@@ -187,11 +574,15 @@ def get_y3():
     -------
     yql.ThreeLegged
     """
+    import yql
+
     consumer_key, consumer_secret = config.get_consumer_secret()
     y3 = yql.ThreeLegged(consumer_key, consumer_secret)
     return y3
 
-def get_all_player_points(y3, token, league_key, num_teams=12):
+def get_all_player_points(y3, token, league_key, num_teams=None,
+                          max_workers=None, force_refresh=False,
+                          team_keys=None, rosters=None, week=None):
     """Queries the y3 connection to return a dict of player_id and player_points
     for use in updating player objects
 
@@ -204,25 +595,49 @@ def get_all_player_points(y3, token, league_key, num_teams=12):
     league_key: str
         The league_key to query in the form XXX.l.XXXX
     num_teams: int
-        The number of teams in the league.  Defaults to 12
+        The number of teams in the league.  If None it is read from the league
+        settings.  Defaults to None
+    max_workers: int
+        The number of batches to query concurrently.  If None the value from
+        the config file is used.  Defaults to None
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
+    team_keys: list[str]
+        Only query these teams.  If None every team in the league is queried.
+        Defaults to None
+    rosters: dict
+        If given it is filled with each queried team_key and the list of its
+        player_ids in roster order, for detecting roster moves with
+        PlayerIndex.moved.  Defaults to None
+    week: int
+        The week to query.  If None the current week is queried.  Defaults to
+        None
 
     Returns
     -------
     dict
-        The dict of player_id and player_points
+        The dict of player_id and player_points as floats
     """
-    player_points = {}
-    for team in range(1, num_teams + 1):
-        query = """SELECT roster.players.player
-                     FROM fantasysports.teams.roster.stats
-                    WHERE team_key='%s.t.%s'""" % (league_key, team)
-        data_yql = y3.execute(query, token=token).rows
-        for player in data_yql:
-            player = player['roster']['players']['player']
-            player_points[player['player_id']] = player['player_points']['total']
+    if team_keys is None:
+        num_teams = get_num_teams(y3, token, league_key, num_teams)
+        team_keys = get_team_keys(league_key, num_teams)
+    with instrument.span('get_all_player_points') as span:
+        player_points = {}
+        for team_key, rows in iter_roster_rows(
+                y3, token, 'roster.players.player', team_keys, week=week,
+                max_workers=max_workers, force_refresh=force_refresh):
+            player_ids = []
+            for player in rows:
+                player = player['roster']['players']['player']
+                player_ids.append(player['player_id'])
+                player_points[player['player_id']] = to_float(
+                    player['player_points']['total'])
+            if rosters is not None:
+                rosters[team_key] = player_ids
+        span.add(objects=len(player_points))
     return player_points
 
-def get_matchup_points(y3, token, league_key):
+def get_matchup_points(y3, token, league_key, force_refresh=False):
     """Extract points and projected points from each of the matchups in
      fantasysports.leagues.scoreboard
 
@@ -234,18 +649,23 @@ def get_matchup_points(y3, token, league_key):
         The token used for the y3 connection
     league_key: str
         The league key in the form XXX.l.XXXX
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
 
     Returns
     -------
     list(list(dict))
         A list with length the number of matchups in the league = num_teams /2
         Each sublist is the first and second team.  Each dict is the team name,
-        points, and projected_points
+        team_key, points, projected_points, and the remaining_games and
+        live_games of the team's players, None if the scoreboard has no game
+        counts
     """
     query = """SELECT *
                  FROM fantasysports.leagues.scoreboard
                 WHERE league_key = '%s'""" % league_key
-    data_yql = y3.execute(query, token=token).rows[0]
+    data_yql = execute(y3, token, query, league_key,
+                       force_refresh=force_refresh)[0]
     matchups = data_yql['scoreboard']['matchups']['matchup']
 
     def extract_matchup(team):
@@ -259,17 +679,25 @@ def get_matchup_points(y3, token, league_key):
         Returns
         -------
         dict:
-            dict of name, points, and projected_points
+            dict of name, team_key, points, projected_points, remaining_games
+            and live_games
         """
-        result = dict(name=team['name'])
-        result['points'] = team['team_points']['total']
-        result['projected_points'] = team['team_projected_points']['total']
+        result = dict(name=team['name'], team_key=team['team_key'])
+        result['points'] = to_float(team['team_points']['total'])
+        result['projected_points'] = to_float(
+            team['team_projected_points']['total'])
+        games = (team.get('team_remaining_games') or {}).get('total') or {}
+        for field in ('remaining_games', 'live_games'):
+            value = games.get(field)
+            result[field] = int(value) if value is not None else None
         return result
     matchups = [[extract_matchup(t) for t in m['teams']['team']] for m in matchups]
     return matchups
 
-def construct_teams_and_players(y3, token, league_key, week):
-    """Construct a list of Team objects from querying y3 using get_team_stats
+def construct_teams_and_players(y3, token, league_key, week,
+                                force_refresh=False, stat_index=None,
+                                num_teams=None):
+    """Construct a list of Team objects from querying y3 using iter_teams
 
     Parameters
     ----------
@@ -281,22 +709,160 @@ def construct_teams_and_players(y3, token, league_key, week):
         The league_key to use in the query in the form XXX.l.XXXX
     week: int
         The week to query for player stats
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
+    stat_index: StatIndex
+        The order of the stats held by each Player.  If None it is built from
+        the league's stat_categories.  Defaults to None
+    num_teams: int
+        The number of teams in the league.  If None it is read from the league
+        settings.  Defaults to None
 
     Returns
     -------
     list[Team]
         The list of Team objects constructed from the query data
     """
-    teams_data = get_teams_stats(y3, token, league_key, week)
-    teams = []
-    for team in teams_data:
+    return list(iter_teams(y3, token, league_key, week, num_teams,
+                           force_refresh=force_refresh,
+                           stat_index=stat_index))
+
+def iter_teams(y3, token, league_key, week, num_teams=None, force_refresh=False,
+               stat_index=None, team_keys=None):
+    """Query the teams in the league and yield a Team object for each one as
+    soon as its roster has arrived
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The connection to use to query teams and player data
+    token: yql.YahooToken
+        Token to use to secure y3
+    league_key: str
+        The league_key to use in the query in the form XXX.l.XXXX
+    week: int
+        The week to query for player stats
+    num_teams: int
+        The number of teams in the league.  If None it is read from the league
+        settings.  Defaults to None
+    force_refresh: bool
+        If True the response cache is bypassed.  Defaults to False
+    stat_index: StatIndex
+        The order of the stats held by each Player.  If None it is built from
+        the league's stat_categories.  Defaults to None
+    team_keys: list[str]
+        Only load these teams.  If None every team in the league is loaded.
+        Defaults to None
+
+    Yields
+    ------
+    Team
+        The Team objects in team number order, one for every team_key.  A team
+        whose roster query returned nothing has no players and its team_key
+        as its name
+    """
+    if stat_index is None:
+        stat_index = get_stat_index(y3, token, league_key)
+    if team_keys is None:
+        num_teams = get_num_teams(y3, token, league_key, num_teams)
+        team_keys = get_team_keys(league_key, num_teams)
+    for team_key, rows in iter_roster_rows(
+            y3, token, '*', team_keys, week=week, force_refresh=force_refresh,
+            output='json', extract=extract_roster):
+        if rows:
+            yield construct_team(rows[0], stat_index)
+        else:
+            # Keep the team's place so columns still line up with team_keys
+            yield Team([], team_key=team_key, name=team_key)
+
+def get_stat_index(y3, token, league_key):
+    """Return a StatIndex over the league's stat_categories ordered by stat_id
+
+    Parameters
+    ----------
+    y3: yql.ThreeLegged
+        The connection to use for the yql query
+    token: yql.YahooToken
+        The token used to secure the y3 connection
+    league_key: str
+        The league_key to use for the query in the form XXX.l.XXXX
+
+    Returns
+    -------
+    StatIndex
+    """
+    stat_categories = get_stat_categories(y3, token, league_key)
+    return StatIndex(sorted(stat_categories, key=int))
+
+def extract_player(player):
+    """Return the fields of a raw player that Player reads, with its
+    player_stats flattened to a stats dict of stat_id and value
+
+    Parameters
+    ----------
+    player: dict
+        A player from the roster of a fantasysports.teams.roster.stats row
+
+    Returns
+    -------
+    dict
+    """
+    name = player.get('name') or {}
+    stats = (player.get('player_stats') or {}).get('stats') or {}
+    slim = {'player_id': player.get('player_id'),
+            'name': dict((k, name.get(k)) for k in ('first', 'last', 'full')),
+            'display_position': player.get('display_position'),
+            'selected_position': {'position': (
+                player.get('selected_position') or {}).get('position')},
+            'bye_weeks': {'week': (player.get('bye_weeks') or {}).get('week')},
+            'stats': dict((d['stat_id'], d['value'])
+                          for d in stats.get('stat', []))}
+    if player.get('player_points') is not None:
+        slim['player_points'] = {'total': player['player_points'].get('total')}
+    return slim
+
+def extract_roster(rows):
+    """Keep only the parts of fantasysports.teams.roster.stats rows read by
+    construct_team, dropping the rest of the response before it is cached
+
+    Parameters
+    ----------
+    rows: list
+        The rows returned by the query
+
+    Returns
+    -------
+    list
+        The rows with only team_key, name and the extract_player fields of
+        each player
+    """
+    return [{'team_key': team.get('team_key'), 'name': team.get('name'),
+             'roster': {'players': {'player': [
+                 extract_player(player)
+                 for player in team['roster']['players']['player']]}}}
+            for team in rows]
+
+def construct_team(team, stat_index=None):
+    """Construct a Team object and its Player objects from the team data
+
+    Parameters
+    ----------
+    team: dict
+        A row returned from fantasysports.teams.roster.stats, either raw or
+        reduced by extract_roster
+    stat_index: StatIndex
+        The order of the stats held by each Player.  Defaults to None
+
+    Returns
+    -------
+    Team
+    """
+    with instrument.span('construct_team') as span:
         players = []
-        roster = team.pop('roster')
-        for player in roster['players']['player']:
-            player_stats = player.pop('player_stats')
-            player_stats = player_stats['stats']['stat']
-            player['stats'] = {d['stat_id']: d['value'] for d in player_stats}
-            player = Player(**player)
-            players.append(player)
-        teams.append(Team(players, **team))
-    return teams
+        for player in team['roster']['players']['player']:
+            if 'player_stats' in player:
+                player = extract_player(player)
+            players.append(Player(stat_index, **player))
+        span.add(objects=len(players))
+        return Team(players, team_key=team.get('team_key'),
+                    name=team.get('name'))
@@ -0,0 +1,211 @@
+"""Headless monitor that polls the league rosters and writes the player and
+team points that changed as newline-delimited JSON, on stdout or to every
+client of a local unix socket.
+
+    python yff_daemon.py
+    python yff_daemon.py --socket /tmp/yff.sock --league 348.l.102564
+
+Each line is one record, e.g.
+
+    {"type": "player", "league_key": "348.l.102564", "team_key":
+     "348.l.102564.t.1", "player_id": "8261", "points": 12.5}
+    {"type": "team", "league_key": "348.l.102564", "team_key":
+     "348.l.102564.t.1", "points": 87.3}
+
+Nothing from PySide, pandas or the projected points scraper is imported so
+startup is quick and the process only keeps the last points of each player.
+"""
+import os
+import sys
+import math
+import json
+import time
+import socket
+import argparse
+import threading
+
+from data import config
+from changefeed import ChangeFeed
+from ratelimit import priority, register, allow, LIVE
+from refresh_schedule import RefreshSchedule
+from yahoo_tools import (get_league_settings, get_matchup_points,
+                         iter_roster_rows)
+
+# Seconds a client may stall a write before it is dropped
+SEND_TIMEOUT = 1.
+
+
+class StreamSink(object):
+    """Writes records as lines of JSON to a file object, stdout by default"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def write(self, records):
+        for record in records:
+            self.stream.write(json.dumps(record) + '\n')
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+class SocketSink(object):
+    """Serves records as lines of JSON to every client connected to a unix
+    socket.  Clients only receive the records written after they connect and
+    are dropped once they stop reading, or when a write to them stalls for
+    SEND_TIMEOUT seconds so a slow client cannot hold up the refreshes
+
+    Parameters
+    ----------
+    path: str
+        The path of the unix socket to create
+    """
+    def __init__(self, path):
+        self.path = path
+        self.clients = []
+        self.lock = threading.Lock()
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(5)
+        thread = threading.Thread(target=self.accept)
+        thread.daemon = True
+        thread.start()
+
+    def accept(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except socket.error:
+                return
+            client.settimeout(SEND_TIMEOUT)
+            with self.lock:
+                self.clients.append(client)
+
+    def write(self, records):
+        if not records:
+            return
+        data = ''.join(json.dumps(record) + '\n' for record in records)
+        with self.lock:
+            clients = list(self.clients)
+        dropped = []
+        for client in clients:
+            try:
+                client.sendall(data)
+            except (socket.timeout, socket.error):
+                client.close()
+                dropped.append(client)
+        if dropped:
+            with self.lock:
+                self.clients = [c for c in self.clients if c not in dropped]
+
+    def close(self):
+        self.server.close()
+        with self.lock:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def run(backend, league_keys, sink, refresh_rate, once=False):
+    """Poll every league until interrupted, writing the changed points to sink.
+    Each league has a RefreshSchedule deciding when it is next due and which
+    of its teams to refresh, fed the league scoreboard whenever it asks for
+    it, and is only refreshed while its share of the request budget of the
+    shared RateLimiter allows
+
+    Parameters
+    ----------
+    backend: backends.Backend
+        The source of the league data
+    league_keys: list[str]
+        The leagues to monitor
+    sink: StreamSink, SocketSink
+        Where the records are written
+    refresh_rate: int
+        The base number of milliseconds between refreshes of a league
+    once: bool
+        If True every league is refreshed once and run returns.  Defaults to
+        False
+    """
+    token = backend.get_token()
+    leagues = {}
+    for league_key in league_keys:
+        register(league_key)
+        settings = get_league_settings(backend, token, league_key)
+        feed = ChangeFeed(league_key)
+        feed.subscribe(sink.write)
+        leagues[league_key] = (settings['team_keys'],
+                               RefreshSchedule(refresh_rate,
+                                               season=settings['season']),
+                               feed)
+    due = dict.fromkeys(league_keys, 0.)
+    while True:
+        now = time.time()
+        for league_key, (team_keys, schedule, feed) in leagues.iteritems():
+            if due[league_key] > now:
+                continue
+            due[league_key] = now + schedule.interval() / 1000.
+            if schedule.scoreboard_due() and allow(league_key):
+                try:
+                    with priority(LIVE):
+                        schedule.record_scoreboard(get_matchup_points(
+                            backend, token, league_key, force_refresh=True))
+                except Exception as e:
+                    sys.stderr.write('%s: scoreboard failed: %s\n' %
+                                     (league_key, e))
+            team_keys = schedule.teams_due(team_keys)
+            cost = int(math.ceil(float(len(team_keys)) /
+                                 config.get_batch_size()))
+            if not team_keys or not allow(league_key, cost):
+                continue
+            changes = {}
+            try:
+                with priority(LIVE):
+                    for team_key, rows in iter_roster_rows(
+                            backend, token, 'roster.players.player',
+                            team_keys, force_refresh=True):
+                        changes[team_key] = bool(feed.update(team_key, rows))
+            except Exception as e:
+                sys.stderr.write('%s: refresh failed: %s\n' % (league_key, e))
+            schedule.record(changes)
+        if once:
+            return
+        time.sleep(max(min(due.values()) - time.time(), 0.1))
+
+def main():
+    from backends import YQLBackend, ReplayBackend
+    import instrument
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--league', action='append',
+                        help='league_key to monitor, may be repeated.  '
+                             'Defaults to the leagues in the config')
+    parser.add_argument('--socket', help='serve the records on this unix '
+                                         'socket instead of stdout')
+    parser.add_argument('--interval', type=float,
+                        help='base seconds between refreshes of a league, '
+                             'defaults to the config refresh_rate')
+    parser.add_argument('--once', action='store_true',
+                        help='refresh every league once and exit')
+    parser.add_argument('--replay', help='directory of recorded responses to '
+                                         'serve instead of Yahoo')
+    parser.add_argument('--trace', help='append timing spans to this file')
+    args = parser.parse_args()
+    if args.trace:
+        instrument.enable(args.trace)
+    backend = ReplayBackend(args.replay) if args.replay else YQLBackend()
+    league_keys = args.league or config.get_league_keys()
+    if args.interval is not None:
+        refresh_rate = int(args.interval * 1000)
+    else:
+        refresh_rate = config.get_gui_parameter('refresh_rate')
+    sink = SocketSink(args.socket) if args.socket else StreamSink()
+    try:
+        run(backend, league_keys, sink, refresh_rate, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,22 @@
 from PySide import QtGui, QtCore
 import sys
+import time
+import argparse
 import webbrowser
-import yql
 
-from yahoo_tools import get_week, load_teams, get_stat_categories, get_token
-from yahoo_tools import get_all_player_points
+from yahoo_tools import get_week, is_closed_week
+from backends import YQLBackend, RecordingBackend, ReplayBackend
+from data_service import DataService, LeagueScheduler
+from ratelimit import get_limiter
+from scoreboard import format_matchup
+from table_model import LeagueTableModel
+from player import PlayerIndex
+from lineup import league_lineups
 from data import config
+import instrument
+
+# Seconds to wait for a reloaded team before a roster move can reload it again
+RELOAD_TIMEOUT = 60.
 
 
 class EnterCode(QtGui.QWidget):
@@ -14,10 +25,39 @@ class EnterCode(QtGui.QWidget):
         self.auth_url = auth_url
 
 class MonitorGUI(QtGui.QMainWindow):
-    def __init__(self):
+    """Main window with a tab for each league in config.get_league_keys().
+    Every league shares one backend and token, and their refreshes are
+    interleaved by a LeagueScheduler within a shared request budget
+    """
+    def __init__(self, backend=None):
         super(MonitorGUI, self).__init__()
-        self.setCentralWidget(MonitorWidget())
+        self.backend = YQLBackend() if backend is None else backend
+        self.token = self.backend.get_token(self.enter_token)
+        self.tabs = QtGui.QTabWidget(self)
+        self.widgets = []
+        for league_key in config.get_league_keys():
+            widget = MonitorWidget(self.backend, self.token, league_key)
+            self.widgets.append(widget)
+            self.tabs.addTab(widget, league_key)
+        self.setCentralWidget(self.tabs)
         self.init_menu()
+        self.tabs.currentChanged.connect(self.sync_week_menu)
+        self.scheduler = LeagueScheduler(
+            self.widgets, config.get_gui_parameter('refresh_rate'), self)
+
+    def current(self):
+        """Return the MonitorWidget of the selected tab"""
+        return self.tabs.currentWidget()
+
+    def set_scoreboard_mode(self, checked):
+        """Switch between refreshing full rosters and refreshing only the
+        scoreboard plus the rosters of changed matchups, with the win
+        probabilities simulated from the season saved on disk
+        """
+        self.scheduler.scoreboard_mode = checked
+        if checked:
+            for widget in self.widgets:
+                widget.service.load_model()
 
     def init_menu(self):
         """Initiate the drop down menus for the window"""
@@ -28,8 +68,46 @@ class MonitorGUI(QtGui.QMainWindow):
             'Refresh', action_menu, shortcut=QtGui.QKeySequence.Refresh)
         # self.refresh.triggered.connect(self.change_stat)
         action_menu.addAction(self.refresh)
+        self.scoreboard_action = QtGui.QAction(
+            'Scoreboard Mode', action_menu, checkable=True)
+        self.scoreboard_action.toggled.connect(self.set_scoreboard_mode)
+        action_menu.addAction(self.scoreboard_action)
         self.setup_roster_menu()
         self.setup_week_menu()
+        for widget in self.widgets:
+            widget.service.worker.settings_loaded.connect(
+                self.add_stat_actions)
+            widget.refreshed.connect(self.show_refresh_latency)
+            widget.error.connect(self.show_error)
+
+    def show_refresh_latency(self, changes=None):
+        """Show the time taken by the last points refresh, if spans are being
+        recorded, and the requests used and remaining in the status bar
+        """
+        messages = []
+        fetch = instrument.last('get_all_player_points')
+        apply = instrument.last('apply_points')
+        if fetch is not None and apply is not None:
+            messages.append('Last refresh: fetch %.0f ms, table %.0f ms' %
+                            (fetch.duration * 1000, apply.duration * 1000))
+        limiter = get_limiter()
+        if limiter is not None:
+            counts = limiter.counters()
+            messages.append('Requests: %d used, %s remaining, %d throttled' %
+                            (counts['used'], counts['remaining'],
+                             counts['throttled']))
+        if messages:
+            self.statusBar().showMessage('  |  '.join(messages))
+
+    def show_error(self, message):
+        """Show a failed load in the status bar until the next refresh"""
+        self.statusBar().showMessage('Error: %s' % message)
+
+    def closeEvent(self, event):
+        self.scheduler.stop()
+        for widget in self.widgets:
+            widget.service.stop()
+        super(MonitorGUI, self).closeEvent(event)
 
     def setup_roster_menu(self):
         self.roster_menu = QtGui.QMenu('Roster')
@@ -48,16 +126,29 @@ class MonitorGUI(QtGui.QMainWindow):
             self.roster_mapper.setMapping(action, stat)
             action.triggered.connect(self.roster_mapper.map)
             self.roster_menu.addAction(action)
-        for stat_id, name in self.centralWidget().stat_categories.iteritems():
-            action = QtGui.QAction(name, self, checkable=True)
-            self.roster_mapper.setMapping(action, name)
-            action.triggered.connect(self.roster_mapper.map)
-            self.roster_menu.addAction(action)
         self.roster = 'Initial'
         for action in self.roster_menu.actions():
             action.setChecked(action.text() == self.roster)
         self.roster_mapper.mapped['QString'].connect(self.change_roster_menu)
 
+    def add_stat_actions(self, settings):
+        """Add an action to the roster menu for each of the stat_categories
+        once the league settings have been loaded by the data service
+
+        Parameters
+        ----------
+        settings: dict
+            The league settings returned by get_league_settings
+        """
+        for stat_id, name in settings['stat_categories'].iteritems():
+            if name in self.player_mapper:
+                continue
+            self.player_mapper[name] = 'stat:%s' % stat_id
+            action = QtGui.QAction(name, self, checkable=True)
+            self.roster_mapper.setMapping(action, name)
+            action.triggered.connect(self.roster_mapper.map)
+            self.roster_menu.addAction(action)
+
     def setup_week_menu(self):
         self.week_menu = QtGui.QMenu('Week')
         self.menubar.addMenu(self.week_menu)
@@ -67,27 +158,26 @@ class MonitorGUI(QtGui.QMainWindow):
             self.week_mapper.setMapping(action, 'Week %s' % week)
             action.triggered.connect(self.week_mapper.map)
             self.week_menu.addAction(action)
-        for action in self.week_menu.actions():
-            action.setChecked(action.text() == 'Week %s' % self.centralWidget().week)
+        self.sync_week_menu()
         self.week_mapper.mapped['QString'].connect(self.change_week_menu)
 
+    def sync_week_menu(self):
+        """Check the week menu action of the week shown in the current tab"""
+        for action in self.week_menu.actions():
+            action.setChecked(action.text() == 'Week %s' % self.current().week)
+
     def change_week_menu(self, week_name):
         for action in self.week_menu.actions():
             action.setChecked(action.text() == week_name)
-        week = week_name.split(' ')[1]
-        if week != self.centralWidget().week:
-            self.centralWidget().week = week
-            #ToDo This needs to be sped up or run in the background in pieces
-            self.teams = load_teams(week=week,
-                dialog=self.enter_token, get_proj_points=True, y3=self.y3)
-        if self.df is not None:
-            self.change_stat()
+        week = int(week_name.split(' ')[1])
+        if week != self.current().week:
+            self.current().load_week(week, get_proj_points=True)
 
     def change_roster_menu(self, how):
-        self.centralWidget().roster = self.player_mapper[how]
+        self.current().roster = self.player_mapper[how]
         for action in self.roster_menu.actions():
             action.setChecked(action.text() == how)
-        self.change_stat(self.centralWidget().roster)
+        self.change_stat(self.current().roster)
 
     @staticmethod
     def action(*args, **kwargs):
@@ -98,117 +188,286 @@ class MonitorGUI(QtGui.QMainWindow):
         return action
 
     def change_stat(self, attr):
-        for col, team in enumerate(self.centralWidget().teams):
-            for row, player in enumerate(team.players):
-                self.centralWidget().datatable.item(row, col).setText(
-                    getattr(player, attr))
+        for widget in self.widgets:
+            widget.roster = attr
+            widget.model.set_attr(attr)
+
+    def enter_token(self, auth_url):
+        text = '''<a href='%s'>%s</a> Enter Code:''' % (auth_url, auth_url)
+        webbrowser.open(auth_url)
+        verifier, ok = QtGui.QInputDialog.getText(self, 'Input Dialog', text)
+        return str(verifier) if ok else None
 
 class MonitorWidget(QtGui.QWidget):
-    def __init__(self):
+    refreshed = QtCore.Signal(object)
+    error = QtCore.Signal(str)
+
+    def __init__(self, backend, token, league_key):
         super(MonitorWidget, self).__init__()
         self.week = get_week()
         if self.week is None:
             self.week = 1
-        consumer_key, consumer_secret = config.get_consumer_secret()
-        self.y3 = yql.ThreeLegged(consumer_key, consumer_secret)
-        self.token = get_token(self.y3)
-        self.league_key = config.get_league_key()
-        self.stat_categories = get_stat_categories(
-            self.y3, self.token, self.league_key)
+        self.backend = backend
+        self.token = token
+        self.league_key = league_key
+        self.stat_categories = {}
+        self.roster_positions = []
         self.roster = 'initial'
-        self.teams = load_teams(self.week, self.enter_token, y3=self.y3)
+        self.teams = []
+        self.index = PlayerIndex()
+        self.reloading = {}
+        self.request_id = None
+        self.model = None
         self.datatable = None
         self.initialise_table()
-        self.refresh_rate = config.get_gui_parameter('refresh_rate')
-        self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(self.update_player_points)
-        self.timer.start(self.refresh_rate)
-
-    def update_player_points(self):
-        """Fetch the player_points for all players and update the Player objects
-        If player_points is currently be viewed then the table is updated
-        """
-        player_points = get_all_player_points(self.y3, self.token, self.league_key)
-        for team in self.teams:
-            for player in team.players:
-                player.set_player_points(player_points[player.player_id])
-        if self.roster == 'player_points':
-            self.update_table()
-
-    def initialise_table(self, attr='initial'):
-        """Initialise the self.datatable object and populate with the default
-        attribute attr from each player
+        self.service = DataService(self.backend, self.token, self.league_key,
+                                   self)
+        worker = self.service.worker
+        worker.settings_loaded.connect(self.set_settings)
+        worker.team_loaded.connect(self.add_team)
+        worker.proj_points_loaded.connect(self.set_proj_points)
+        worker.points_loaded.connect(self.set_player_points)
+        worker.scoreboard_loaded.connect(self.set_scoreboard)
+        worker.failed.connect(self.report_failure)
+        self.service.load_settings()
+        self.load_week(self.week, get_proj_points=True)
+
+    def load_week(self, week, get_proj_points=False):
+        """Clear the table and request the teams for week from the data
+        service.  The table is filled in team by team as they arrive
 
         Parameters
         ----------
-        attr: str
-            The attr to use for the initial population of the table.  Defaults
-            to 'initial'
+        week: int
+            The week to load
+        get_proj_points: bool
+            If True the projected points are also loaded.  Defaults to False
         """
-        self.datatable = QtGui.QTableWidget(parent=self)
-        self.datatable.setGeometry(0, 0, 1400, 600)
-        self.datatable.setColumnCount(len(self.teams))
-        self.datatable.setRowCount(len(self.teams[0].players))
-        team_names = []
-        for col, team in enumerate(self.teams):
-            team_names.append(team.name)
-            for row, player in enumerate(team.players):
-                self.datatable.setItem(
-                    row, col, QtGui.QTableWidgetItem(getattr(player, attr)))
-        self.datatable.setHorizontalHeaderLabels(team_names)
-        positions = ['QB', 'WR', 'WR', 'RB', 'RB', 'TE', 'W/R/T', 'K', 'DEF']
-        positions += ['BN'] * 6
-        self.datatable.setVerticalHeaderLabels(positions)
+        self.week = week
+        self.teams = []
+        self.index = PlayerIndex()
+        self.reloading = {}
+        self.model.clear()
+        self.request_id = self.service.load_week(week, get_proj_points)
 
-    def update_table(self):
-        """Check if the any of the values in the datatable have changed in
-        comparison to self.teams and the player attribute set in self.roster.
-        If a cell value has changed then the cell is highlighted for the
-        default amount of time
+    def set_settings(self, settings):
+        """Size the table rows from the league's roster positions
+
+        Parameters
+        ----------
+        settings: dict
+            The league settings returned by get_league_settings
         """
-        for col, team in enumerate(self.teams):
-            for row, player in enumerate(team.players):
-                value = getattr(player, self.roster)
-                if self.datatable.item(row, col).text() != value:
-                    self.highlightCell(row, col, value=value)
+        self.stat_categories = settings['stat_categories']
+        self.roster_positions = settings['roster_positions']
+        self.model.set_positions(settings['roster_positions'])
 
-    def highlightCell(self, row, col, timelimit=3000, color='red', value=None):
-        """Highlight the cell background in the color specified.  After the
-        timelimit the cell background is set to white
+    def add_team(self, request_id, col, team):
+        """Add the column for team to the table if it belongs to the current
+        request, or replace it if the team was reloaded after a roster move
 
         Parameters
         ----------
-        row: int
-            The row indexed from 0 for the datatable
+        request_id: int
+            The id of the request the team was loaded for
         col: int
-            The column indexed from 0 for the datatable
-        timelimit: int
-            The time in milliseconds before the cell background is set to white.
-            Defaults to 3000
-        color: str
-            The color the cell is to be highlighted.  Must be acceptable by
-            QtCore.QColor().  Defaults to 'red'.
-        value: str, int
-            If set the text of the cell will be set to value.  Defaults to None.
-        """
-        cell = self.datatable.item(row, col)
-        if value is not None:
-            cell.setText(value)
-        cell.setBackground(QtGui.QColor(color))
-        timer = QtCore.QTimer()
-        timer.singleShot(timelimit,
-                         lambda: cell.setBackground(QtGui.QColor('white')))
+            The column indexed from 0 for the team
+        team: Team
+            The loaded team
+        """
+        if request_id != self.request_id:
+            return
+        if col < len(self.teams):
+            self.reloading.pop(team.team_key, None)
+            self.teams[col] = team
+            self.index.replace_team(col, team)
+            self.model.replace_team(col, team)
+            return
+        self.teams.append(team)
+        self.index.add_team(team)
+        self.model.add_team(team)
 
-    def enter_token(self, auth_url):
-        text = '''<a href='%s'>%s</a> Enter Code:''' % (auth_url, auth_url)
-        webbrowser.open(auth_url)
-        verifier, ok = QtGui.QInputDialog.getText(self, 'Input Dialog', text)
-        return str(verifier) if ok else None
+    def report_failure(self, request_id, error):
+        """Log a failed load of the data service to stderr and pass it on
+        through the error signal
+
+        Parameters
+        ----------
+        request_id: int
+            The id of the request that failed, -1 for the league settings
+        error: Exception
+            The exception raised by the worker
+        """
+        message = '%s: %s' % (self.league_key, error)
+        sys.stderr.write(message + '\n')
+        self.error.emit(message)
+
+    def update_scoreboard(self):
+        """Request the scoreboard from the data service, set_scoreboard is
+        called once it arrives
+        """
+        self.service.load_scoreboard(self.teams)
+
+    def set_scoreboard(self, request_id, matchups, changed, odds):
+        """Show the matchup scores and simulated win probabilities below the
+        table.  If no matchup changed refreshed is emitted with no changes so
+        the schedule can back off
+
+        Parameters
+        ----------
+        request_id: int
+            The id of the request the scoreboard was loaded for
+        matchups: list
+            The matchups as returned by get_matchup_points
+        changed: list[str]
+            The team_keys in matchups whose score changed
+        odds: dict
+            The simulated win probability of each team_key, matchups without
+            projected points are left out
+        """
+        if request_id != self.request_id:
+            return
+        lines = []
+        for matchup in matchups:
+            line = format_matchup(matchup)
+            if all(t['team_key'] in odds for t in matchup):
+                line += '  (%s)' % ' / '.join(
+                    '%.0f%%' % (100 * odds[t['team_key']]) for t in matchup)
+            lines.append(line)
+        self.scoreboard.setText('\n'.join(lines))
+        if not changed:
+            self.refreshed.emit({})
+
+    def update_player_points(self, team_keys=None):
+        """Request the player_points from the data service, set_player_points
+        is called once they arrive
+
+        Parameters
+        ----------
+        team_keys: list[str]
+            Only refresh these teams.  If None every team is refreshed.
+            Defaults to None
+        """
+        self.service.load_points(team_keys)
+
+    def set_player_points(self, request_id, player_points, rosters=None):
+        """Update the Player objects with player_points and emit refreshed with
+        whether each refreshed team changed.  If player_points is currently
+        being viewed then the table is updated.  Teams whose roster has changed
+        since they were loaded are reloaded
+
+        Parameters
+        ----------
+        request_id: int
+            The id of the request the points were loaded for
+        player_points: dict
+            The dict of player_id and player_points, only those that changed
+            since the last refresh
+        rosters: dict
+            The dict of team_key and its player_ids in roster order.  Defaults
+            to None, skipping the check for roster moves
+        """
+        if request_id != self.request_id:
+            return
+        with instrument.span('apply_points') as span:
+            changed, scattered = self.index.scatter('player_points',
+                                                    player_points)
+            changes = dict.fromkeys(rosters or (), False)
+            changes.update(scattered)
+            self.model.refresh('player_points', changed)
+            span.add(objects=len(changed))
+        moved = self.moved_teams(rosters or {})
+        if moved:
+            self.service.reload_teams(moved)
+            for team_key in moved:
+                changes[team_key] = True
+        self.refreshed.emit(changes)
+
+    def moved_teams(self, rosters):
+        """Return the teams in rosters whose roster moved since they were
+        loaded and that are not already being reloaded.  The rosters of a
+        closed week cannot move so nothing is returned for one
+
+        Parameters
+        ----------
+        rosters: dict
+            The dict of team_key and its player_ids in roster order
+        """
+        if is_closed_week(self.week):
+            return []
+        now = time.time()
+        moved = [team_key for team_key in self.index.moved(rosters)
+                 if self.reloading.get(team_key, 0.) + RELOAD_TIMEOUT < now]
+        for team_key in moved:
+            self.reloading[team_key] = now
+        return moved
+
+    def set_proj_points(self, request_id, proj_points):
+        """Update the Player objects with proj_points.  If proj_points is
+        currently being viewed then the table is updated
+
+        Parameters
+        ----------
+        request_id: int
+            The id of the request the points were loaded for
+        proj_points: dict
+            The dict of player_id and proj_points
+        """
+        if request_id != self.request_id:
+            return
+        self.index.scatter('proj_points', proj_points, fill_missing=True)
+        self.model.refresh('proj_points')
+        self.show_lineups()
+
+    def show_lineups(self):
+        """Show the projected points each team is leaving on the bench compared
+        with its optimal lineup below the team names
+        """
+        lineups = league_lineups(self.teams, self.roster_positions)
+        self.model.set_notes(dict(
+            (team_key, '%.1f on bench' % lineup.left_on_bench)
+            for team_key, lineup in lineups.iteritems()))
+
+    def initialise_table(self):
+        """Initialise the self.datatable view and its model.  Rows are added
+        for each roster position once the league settings have loaded and
+        columns as teams are loaded
+        """
+        self.model = LeagueTableModel([], self.roster, self)
+        self.datatable = QtGui.QTableView(parent=self)
+        self.datatable.setModel(self.model)
+        self.datatable.setGeometry(0, 0, 1400, 600)
+        self.scoreboard = QtGui.QLabel(parent=self)
+        self.scoreboard.setGeometry(0, 600, 1400, 120)
+
+    def update_table(self):
+        """Re-read the player attribute set in self.roster for every player and
+        highlight the cells whose value has changed
+        """
+        self.model.refresh(self.roster)
 
 def main():
     """Main method for the app"""
-    app = QtGui.QApplication(sys.argv)
-    pandas_viewer = MonitorGUI()
+    parser = argparse.ArgumentParser(description='Monitor a Yahoo league')
+    parser.add_argument('--record', metavar='DIR',
+                        help='save every response to DIR for --replay')
+    parser.add_argument('--replay', metavar='DIR',
+                        help='serve responses recorded to DIR, no network')
+    parser.add_argument('--latency', type=float, default=0.,
+                        help='seconds of simulated latency for --replay')
+    parser.add_argument('--trace', metavar='FILE', nargs='?', const='',
+                        help='record timing spans, appended to FILE if given')
+    args, qt_args = parser.parse_known_args()
+    if args.trace is not None:
+        instrument.enable(args.trace or None)
+    if args.replay is not None:
+        backend = ReplayBackend(args.replay, args.latency)
+    elif args.record is not None:
+        backend = RecordingBackend(YQLBackend(), args.record)
+    else:
+        backend = None
+    app = QtGui.QApplication(sys.argv[:1] + qt_args)
+    pandas_viewer = MonitorGUI(backend)
     pandas_viewer.show()
     app.exec_()
 